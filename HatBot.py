@@ -1,45 +1,276 @@
+import asyncio
+import importlib
 import logging
+import time
 import tomllib
+from collections.abc import Callable, Coroutine, Iterable
 from pathlib import Path
 from typing import Any
 
 import discord
 from discord.ext import commands
 from snapcogs.bot import Bot
+from snapcogs.database import Base
 from snapcogs.utils.logging import get_logger
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from cogs.Avatar.avatar import AvatarSettings
+from cogs.utils.checks import ROLE_INDEX
+from cogs.utils.database import (
+    DatabaseProfile,
+    create_read_only_engine,
+    get_engine,
+    optimize,
+    tune_engine,
+)
+from cogs.utils.deferral import AutoDefer
+from cogs.utils.members import MemberCache, MemberCacheSettings
+from cogs.utils.metrics import REGISTRY, MetricsConfig, MetricsServer, instrument
+from cogs.utils.migrations import run_migrations
+from cogs.utils.rendering import RenderService, RenderSettings
+from cogs.utils.tracing import Tracer
 
 LOGGER = logging.getLogger()
 LOGGER.setLevel(logging.INFO)
 if LOGGER.level == logging.DEBUG:
     get_logger("sqlalchemy.engine").setLevel(logging.DEBUG)
 
+# Extensions loaded at startup, with the extensions that need to be loaded
+# before them. Extensions that do not depend on each other are set up
+# concurrently.
+STARTUP_EXTENSIONS: dict[str, tuple[str, ...]] = {
+    "cogs.Avatar": (),
+    "cogs.Presence": (),
+    "snapcogs.Announcements": (),
+    "snapcogs.Fun": (),
+    "snapcogs.Information": (),
+}
+
+# Extensions loaded in the background once the bot is ready, so they do not
+# delay the startup. This is meant for owner-only and seasonal extensions.
+DEFERRED_EXTENSIONS: dict[str, tuple[str, ...]] = {
+    "snapcogs.Admin": (),
+    "cogs.Diagnostics": (),
+}
+
 
 def load_config(file_path: Path | str) -> dict[str, Any]:
     with Path(file_path).open("rb") as f:
         return tomllib.load(f)
 
 
+class HatBot(Bot):
+    """Bot that loads its extensions concurrently, and reports how long it takes."""
+
+    def __init__(
+        self,
+        *args: Any,  # noqa: ANN401
+        extensions: dict[str, tuple[str, ...]],
+        deferred_extensions: dict[str, tuple[str, ...]],
+        database_profile: DatabaseProfile,
+        tracer: Tracer | None = None,
+        metrics: MetricsConfig | None = None,
+        auto_defer: AutoDefer | None = None,
+        render_settings: RenderSettings | None = None,
+        member_cache: MemberCacheSettings | None = None,
+        avatar_settings: AvatarSettings | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        member_cache = member_cache or MemberCacheSettings()
+        kwargs.update(member_cache.client_options())
+        super().__init__(*args, startup_extensions=[], **kwargs)
+        self.started_at = time.perf_counter()
+        self.db_path: str = kwargs.get("db_name", ":memory:")
+        self.db_read_session: async_sessionmaker[AsyncSession] | None = None
+        self.extensions_to_load = extensions
+        self.deferred_extensions = deferred_extensions
+        self.database_profile = database_profile
+        self.avatar_settings = avatar_settings or AvatarSettings()
+        self.tracer = tracer
+        if tracer is not None:
+            tracer.install()
+
+        self.metrics_server: MetricsServer | None = None
+        if metrics is not None and metrics.enabled:
+            if tracer is None:
+                msg = "The metrics need a tracer, to time the interactions."
+                raise ValueError(msg)
+            self.http.http_trace = instrument(tracer, self)
+            self.metrics_server = MetricsServer(REGISTRY, metrics.host, metrics.port)
+
+        if auto_defer is not None:
+            auto_defer.install(self)
+
+        self.renderer = RenderService(render_settings)
+        self.member_cache = MemberCache(member_cache)
+        self.add_listener(self.member_cache.on_raw_member_remove)
+        ROLE_INDEX.install(self)
+        self._deferred_task: asyncio.Task | None = None
+        self._optimize_task: asyncio.Task | None = None
+        # on_ready listeners already timed, later calls are reconnections
+        self._timed_ready_listeners: set[str] = set()
+
+    async def setup_hook(self) -> None:
+        await super().setup_hook()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+        engine = get_engine(self)
+        await tune_engine(engine, self.database_profile)
+        await run_migrations(engine)
+        if self.db_path != ":memory:":
+            read_engine = create_read_only_engine(self.db_path)
+            await tune_engine(read_engine, self.database_profile, read_only=True)
+            self.db_read_session = async_sessionmaker(
+                read_engine, expire_on_commit=False
+            )
+        if self.database_profile.optimize_interval > 0:
+            self._optimize_task = asyncio.create_task(self._optimize_database(engine))
+
+        await self.load_extensions(self.extensions_to_load)
+        self._deferred_task = asyncio.create_task(self._load_deferred_extensions())
+        LOGGER.info(f"Setup done in {time.perf_counter() - self.started_at:.2f} s.")
+
+    async def close(self) -> None:
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+        self.renderer.close()
+        await super().close()
+
+    async def load_extensions(self, extensions: dict[str, tuple[str, ...]]) -> None:
+        """Load the extensions, each one after the extensions it depends on.
+
+        The modules are imported in a thread to not block the event loop, then
+        the extensions are set up concurrently.
+        """
+        start = time.perf_counter()
+        import_times = await asyncio.to_thread(self._import_extensions, extensions)
+        await self._create_tables()
+
+        tasks: dict[str, asyncio.Task[bool]] = {}
+
+        async def load(name: str) -> bool:
+            dependencies = extensions[name]
+            if not all(await asyncio.gather(*(tasks[d] for d in dependencies))):
+                LOGGER.error(f"Not loading {name}, a dependency failed to load.")
+                return False
+
+            setup_start = time.perf_counter()
+            try:
+                await self.load_extension(name)
+            except commands.ExtensionError:
+                LOGGER.exception(f"Failed to load extension {name}.")
+                return False
+
+            LOGGER.info(
+                f"Loaded {name} (import {import_times.get(name, 0) * 1000:.0f} ms, "
+                f"setup {(time.perf_counter() - setup_start) * 1000:.0f} ms)."
+            )
+            return True
+
+        for name in extensions:
+            tasks[name] = asyncio.create_task(load(name))
+        results = await asyncio.gather(*tasks.values())
+
+        LOGGER.info(
+            f"Loaded {sum(results)}/{len(results)} extensions "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms."
+        )
+
+    def _import_extensions(self, names: Iterable[str]) -> dict[str, float]:
+        """Import the extensions' modules, and return how long each one took."""
+        import_times = {}
+        for name in names:
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception:
+                # the error is raised again, and logged, when loading the extension
+                LOGGER.debug(f"Failed to import extension {name}.", exc_info=True)
+            import_times[name] = time.perf_counter() - start
+
+        return import_times
+
+    async def _create_tables(self) -> None:
+        """Create the tables of the models imported by the extensions."""
+        async with self.db.session() as session, session.begin():
+            await session.run_sync(
+                lambda session: Base.metadata.create_all(session.connection())
+            )
+
+    async def _optimize_database(self, engine: AsyncEngine) -> None:
+        """Run PRAGMA optimize on the database periodically."""
+        while True:
+            await asyncio.sleep(self.database_profile.optimize_interval * 3600)
+            try:
+                await optimize(engine)
+            except SQLAlchemyError:
+                LOGGER.exception("Failed to optimize the database.")
+
+    async def _run_event(
+        self,
+        coro: Callable[..., Coroutine[Any, Any, Any]],
+        event_name: str,
+        *args: Any,  # noqa: ANN401
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Run the event listener, and report how long the first on_ready took."""
+        listener = f"{coro.__module__}.{coro.__qualname__}"
+        if event_name != "on_ready" or listener in self._timed_ready_listeners:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+            return
+
+        self._timed_ready_listeners.add(listener)
+        start = time.perf_counter()
+        await super()._run_event(coro, event_name, *args, **kwargs)
+        end = time.perf_counter()
+        LOGGER.info(
+            f"Ran on_ready of {self._extension_of(coro)} ({coro.__qualname__}) "
+            f"in {(end - start) * 1000:.0f} ms, "
+            f"{end - self.started_at:.2f} s after startup."
+        )
+
+    def _extension_of(self, listener: Callable[..., Any]) -> str:
+        """Return the name of the extension the listener comes from."""
+        module = listener.__module__
+        for name in self.extensions:
+            if module == name or module.startswith(f"{name}."):
+                return name
+        return module
+
+    async def _load_deferred_extensions(self) -> None:
+        """Wait until the bot is ready, then load the deferred extensions."""
+        await self.wait_until_ready()
+        LOGGER.info(
+            f"Ready in {time.perf_counter() - self.started_at:.2f} s "
+            f"with the {self.member_cache.settings.mode} member cache "
+            f"({sum(len(guild.members) for guild in self.guilds)} members "
+            f"and {len(self.users)} users cached)."
+        )
+        await self.load_extensions(self.deferred_extensions)
+
+
 def main() -> None:
     config = load_config("config.toml")
     intents = discord.Intents.default()
     intents.members = True
     allowed_mentions = discord.AllowedMentions(replied_user=False)
 
-    startup_extensions = [
-        "cogs.Avatar",
-        "cogs.Presence",
-        "snapcogs.Admin",
-        "snapcogs.Announcements",
-        "snapcogs.Fun",
-        "snapcogs.Information",
-    ]
-    bot = Bot(
+    bot = HatBot(
         description="Hatventures Community's helpful bot.",
         command_prefix=commands.when_mentioned_or("!"),
         intents=intents,
         allowed_mentions=allowed_mentions,
         db_name="db/HatBot.db",
-        startup_extensions=startup_extensions,
+        extensions=STARTUP_EXTENSIONS,
+        deferred_extensions=DEFERRED_EXTENSIONS,
+        database_profile=DatabaseProfile.from_config(config),
+        tracer=Tracer.from_config(config),
+        metrics=MetricsConfig.from_config(config),
+        auto_defer=AutoDefer.from_config(config),
+        render_settings=RenderSettings.from_config(config),
+        member_cache=MemberCacheSettings.from_config(config),
+        avatar_settings=AvatarSettings.from_config(config),
     )
 
     bot.run(config["hatbot_token"], log_level=logging.WARNING)
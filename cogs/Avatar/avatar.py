@@ -1,21 +1,30 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import logging
 import tomllib
-from dataclasses import dataclass
-from datetime import UTC, date, datetime, time
+from dataclasses import dataclass, fields
+from datetime import UTC, date, datetime, time, timedelta
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import discord
 from discord.ext import commands, tasks
+from sqlalchemy import select
+
+from ..utils.config import read_section
+from .backends import AvatarBackend, HttpBackend, LocalBackend
+from .cache import CACHE_PATH, write_atomic
+from .models import AvatarState
+from .processing import prepare_avatar, processing_key
 
 if TYPE_CHECKING:
     from snapcogs.bot import Bot
 
 
 LOGGER = logging.getLogger(__name__)
-PATH = Path(__file__).parent
 
 # We do not care about the year of the event (they repeat every year)
 # But we chose a leap year, to allow for February 29 as a valid date.
@@ -24,26 +33,29 @@ YEAR = 2020
 # Format used to parse dates
 DATE_FMT = "%B %d %Y"
 
+# Number of days in YEAR
+DAYS_IN_YEAR = 366
 
-class EventCache:
-    """Class that encapsulates the handling of the event caching."""
+# Time at which the avatar of the next day is prepared in advance
+PREFETCH_TIME = time(hour=21, tzinfo=UTC)
 
-    path: Path = PATH / "event_cache.txt"
 
-    @classmethod
-    def set_cache(cls, event: str) -> None:
-        """Save the current event name to disk."""
-        with cls.path.open("w") as f:
-            f.write(event)
+@dataclass(frozen=True)
+class AvatarSettings:
+    """Where the files of the HatBot-Avatar repository are read from.
+
+    If repository_path is set, the files are read from that local checkout,
+    otherwise they are downloaded from GitHub. It can be changed in the
+    [avatar] section of config.toml.
+    """
+
+    repository_path: str | None = None
 
     @classmethod
-    def get_cache(cls) -> str | None:
-        """Read the last event name from disk if it exists, else return None."""
-        if cls.path.exists():
-            with cls.path.open() as f:
-                return f.read()
-        else:
-            return None
+    def from_config(cls, config: dict[str, Any]) -> AvatarSettings:
+        """Create the settings from the [avatar] section of the config."""
+        names = {field.name for field in fields(cls)}
+        return cls(**read_section(config, "avatar", names))
 
 
 @dataclass
@@ -83,77 +95,260 @@ def parse_events(config_raw: bytes) -> list[Event]:
     return events
 
 
+def day_of_year(month: int, day: int) -> int:
+    """Return the index of the day in YEAR, from 0 to DAYS_IN_YEAR - 1."""
+    return date(YEAR, month, day).timetuple().tm_yday - 1
+
+
+@dataclass(frozen=True)
+class EventTable:
+    """The events compiled in a lookup table, with one entry per day of the year.
+
+    The fallback event is already resolved in the table, so finding the event
+    for any date is a single lookup.
+    """
+
+    config_hash: str
+    events: dict[str, Event]
+    days: list[str | None]
+
+    def lookup(self, month: int, day: int) -> Event | None:
+        """Return the event for the date, or None if there is no event."""
+        name = self.days[day_of_year(month, day)]
+        return self.events[name] if name is not None else None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "config_hash": self.config_hash,
+            "events": {
+                name: {
+                    "file_name": event.file_name,
+                    "start_date": event.start_date and event.start_date.isoformat(),
+                    "end_date": event.end_date and event.end_date.isoformat(),
+                    "fallback": event.fallback,
+                }
+                for name, event in self.events.items()
+            },
+            "days": self.days,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> EventTable:
+        events = {}
+        for name, event in data["events"].items():
+            for bound in ("start_date", "end_date"):
+                if (d := event.get(bound)) is not None:
+                    event[bound] = date.fromisoformat(d)
+            events[name] = Event(name=name, **event)
+
+        return cls(config_hash=data["config_hash"], events=events, days=data["days"])
+
+
+def compile_events(events: list[Event], config_hash: str) -> EventTable:
+    """Compile the events into a table with one entry per day of the year.
+
+    Raise a RuntimeError if the date ranges of two events overlap.
+    """
+    fallback = next((event for event in events if event.fallback), None)
+    days: list[str | None] = [
+        fallback.name if fallback is not None else None
+    ] * DAYS_IN_YEAR
+    owners: list[Event | None] = [None] * DAYS_IN_YEAR
+
+    for event in events:
+        if event.fallback:
+            continue
+
+        # parse_events makes sure the dates are not None for non-fallback events
+        current: date = event.start_date  # type: ignore[assignment]
+        end: date = event.end_date  # type: ignore[assignment]
+        if current > end:
+            LOGGER.warning(f"Event {event.name} ends before it starts, ignoring.")
+
+        while current <= end:
+            i = day_of_year(current.month, current.day)
+            if (owner := owners[i]) is not None:
+                msg = f"Events {owner.name} and {event.name} overlap on {current}."
+                raise RuntimeError(msg)
+            owners[i] = event
+            days[i] = event.name
+            current += timedelta(days=1)
+
+    return EventTable(
+        config_hash=config_hash,
+        events={event.name: event for event in events},
+        days=days,
+    )
+
+
 class AvatarRepository:
     """Class that handles fetching the assets from the repository."""
 
-    base_url = "https://raw.githubusercontent.com/Snaptraks/HatBot-Avatar/main"
+    def __init__(
+        self,
+        backend: AvatarBackend,
+        *,
+        table_path: Path = CACHE_PATH / "events_table.json",
+        staging_path: Path = CACHE_PATH / "staged",
+    ) -> None:
+        self.backend = backend
+        self.table_path = table_path
+        self.staging_path = staging_path
+        self._table: EventTable | None = None
 
-    def __init__(self, bot: Bot) -> None:
-        self.bot = bot
+    @classmethod
+    def from_settings(cls, bot: Bot, settings: AvatarSettings) -> AvatarRepository:
+        """Create the repository with the backend of the settings.
+
+        If a local checkout of the repository is configured it is used,
+        otherwise the files are downloaded from GitHub.
+        """
+        if settings.repository_path is not None:
+            LOGGER.info(
+                f"Using the local avatar repository at {settings.repository_path}."
+            )
+            return cls(LocalBackend(settings.repository_path))
+
+        return cls(HttpBackend(bot))
 
     async def get_current_event(self) -> Event | None:
         """Get the event from the present date and return the attached data.
 
         If no special event was found, return the fallback one (default avatar).
         """
-        events = parse_events(await self.fetch_events_config())
-        now = discord.utils.utcnow()
-        lookup_date = date(year=YEAR, month=now.month, day=now.day)
-        LOGGER.debug(f"Looking for event at {lookup_date}.")
-
-        for event in events:
-            # we ignore type checking here because if the dates are None and fallback
-            # is False, it will raise an error in parse_events anyway
-            if not event.fallback and (
-                event.start_date <= lookup_date <= event.end_date  # type: ignore[not-none]
-            ):
-                LOGGER.debug(f"Found event {event.name}.")
-                return event
-
-        LOGGER.debug("No active event was found, looking for fallback event.")
-
-        for event in events:
-            if event.fallback:
-                LOGGER.debug("Found fallback event.")
-                return event
-
-        LOGGER.warning("No active event and no fallback found!")
-        return None
+        return await self.get_event(discord.utils.utcnow().date())
+
+    async def get_event(self, day: date) -> Event | None:
+        """Get the event for the given day and return the attached data.
+
+        If no special event was found, return the fallback one (default avatar).
+        """
+        table = await self.get_events_table()
+        LOGGER.debug(f"Looking for event at {day}.")
+
+        event = table.lookup(day.month, day.day)
+        if event is None:
+            LOGGER.warning("No active event and no fallback found!")
+        else:
+            LOGGER.debug(f"Found event {event.name}.")
+
+        return event
+
+    async def get_events_table(self) -> EventTable:
+        """Return the compiled table of events.
+
+        The table is only compiled again when the content of the config.toml
+        file changes, and it is saved to disk to be reused after a restart.
+        If the new config is invalid, the previous table is kept.
+        """
+        config_raw = await self.fetch_events_config()
+        config_hash = hashlib.sha256(config_raw).hexdigest()
+
+        if self._table is None:
+            self._table = await asyncio.to_thread(self._load_table)
+
+        if self._table is None or self._table.config_hash != config_hash:
+            LOGGER.debug("Events config changed, compiling the events table.")
+            try:
+                table = compile_events(parse_events(config_raw), config_hash)
+            except (RuntimeError, TypeError, ValueError):
+                if self._table is None:
+                    raise
+                LOGGER.exception("Invalid events config, keeping the previous one.")
+            else:
+                self._table = table
+                data = json.dumps(table.to_dict()).encode()
+                await asyncio.to_thread(write_atomic, self.table_path, data)
+
+        return self._table
+
+    def _load_table(self) -> EventTable | None:
+        """Load the compiled table of events saved on disk, if it exists."""
+        try:
+            with self.table_path.open("rb") as f:
+                return EventTable.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            LOGGER.exception("Could not read the saved events table.")
+            return None
 
     async def fetch_events_config(self) -> bytes:
         """Get the raw data from the config.toml file in the repository."""
-        config_url = f"{self.base_url}/config.toml"
         LOGGER.debug("Fetching events config.")
-        return await self.fetch_file(config_url)
+        return await self.backend.fetch("config.toml")
 
     async def fetch_event_avatar(self, event: Event) -> bytes:
         """Get the event avatar file from the repository."""
-        avatar_url = f"{self.base_url}/{event.name}/{event.file_name}"
         LOGGER.debug(f"Fetching {event.name} avatar.")
-        return await self.fetch_file(avatar_url)
+        return await self.backend.fetch(f"{event.name}/{event.file_name}")
 
-    async def fetch_file(self, download_url: str) -> bytes:
-        """Abstract downloading a file from the repository.
+    async def get_staged_avatar(self, event: Event) -> bytes:
+        """Return the prepared event avatar, preparing and staging it if needed.
 
-        Get the file from the given URL and return the raw bytes.
-        It might raise an exception in the case of an incorrect URL.
+        The staged avatar is named after the hash of the source image and of
+        the processing settings, so it is prepared again when one of them
+        changes, even across restarts. The image is cropped, resized and
+        compressed in a thread, so that changing the avatar later only has to
+        upload it.
         """
-        LOGGER.debug(f"Fetching {download_url}")
-        async with self.bot.http_session.get(download_url) as response:
-            if response.status != 200:
-                msg = f"Failed to fetch file (status {response.status})."
-                raise RuntimeError(msg)
-
-            LOGGER.debug("Fetched successfully.")
-            return await response.read()
+        content = await self.fetch_event_avatar(event)
+        staged_path = self.staging_path / event.name / f"{processing_key(content)}.png"
+        try:
+            return await asyncio.to_thread(staged_path.read_bytes)
+        except FileNotFoundError:
+            pass
+
+        LOGGER.debug(f"Preparing {event.name} avatar.")
+        avatar = await asyncio.to_thread(prepare_avatar, content)
+        await asyncio.to_thread(write_atomic, staged_path, avatar)
+        await asyncio.to_thread(self._remove_staged_avatars, event, keep=staged_path)
+        LOGGER.debug(f"Staged {event.name} avatar ({len(avatar)} bytes).")
+        return avatar
+
+    def _remove_staged_avatars(self, event: Event, *, keep: Path) -> None:
+        """Remove the avatars of the event staged from older images or settings."""
+        for path in (self.staging_path / event.name).iterdir():
+            if path != keep:
+                path.unlink(missing_ok=True)
+        # staged before they were named after the hash
+        (self.staging_path / f"{event.name}.png").unlink(missing_ok=True)
 
 
 class Avatar(commands.Cog):
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
-        self.repository = AvatarRepository(bot)
+        self.repository = AvatarRepository.from_settings(
+            bot,
+            bot.avatar_settings,  # type: ignore[attr-defined]
+        )
+        self.prefetch_avatars.start()
         self.event_avatars.start()
 
+    async def cog_unload(self) -> None:
+        self.prefetch_avatars.cancel()
+        self.event_avatars.cancel()
+
+    @tasks.loop(time=PREFETCH_TIME)
+    async def prefetch_avatars(self) -> None:
+        """Task to prepare the avatar of the next day's event in advance.
+
+        This way, a slow download or a large image does not delay the change of
+        avatar at midnight.
+        """
+        tomorrow = (discord.utils.utcnow() + timedelta(days=1)).date()
+        event = await self.repository.get_event(tomorrow)
+        if event is None:
+            LOGGER.warning("No event found. Maybe the config file is wrong?")
+            return
+
+        LOGGER.info(f"Preparing avatar for {event.name} on {tomorrow}.")
+        await self.repository.get_staged_avatar(event)
+
+    @prefetch_avatars.before_loop
+    async def prefetch_avatars_before(self) -> None:
+        await self.bot.wait_until_ready()
+
     @tasks.loop(time=time(hour=0, minute=1, tzinfo=UTC))
     async def event_avatars(self) -> None:
         """Task to check if we have entered a new event.
@@ -165,9 +360,9 @@ class Avatar(commands.Cog):
             LOGGER.warning("No event found. Maybe the config file is wrong?")
             return
 
-        if event.name != EventCache.get_cache():
+        state = await self._get_avatar_state()
+        if state is None or event.name != state.event_name:
             LOGGER.info(f"New event detected! Changing avatar for {event.name}...")
-            EventCache.set_cache(event.name)
             await self.edit_avatar(event)
 
     @event_avatars.before_loop
@@ -178,12 +373,23 @@ class Avatar(commands.Cog):
         await self.event_avatars()
 
     async def edit_avatar(self, event: Event) -> None:
-        """Fetch the event's avatar from the repository and edit the bot's avatar."""
-        avatar = await self.repository.fetch_event_avatar(event)
-        # we ignore type here since we will always try to edit the avatar
-        # only if the bot is logged in (self.bot.user is not None)
-        await self.bot.user.edit(avatar=avatar)  # type: ignore[not-none]
-        LOGGER.debug(f"Successfully edited the bot's avatar for {event.name}.")
+        """Upload the event's staged avatar to edit the bot's avatar.
+
+        The avatar is not uploaded again if it is the same as the current one.
+        """
+        avatar = await self.repository.get_staged_avatar(event)
+        digest = hashlib.sha256(avatar).hexdigest()
+        state = await self._get_avatar_state()
+
+        if state is not None and state.avatar_digest == digest:
+            LOGGER.debug(f"Avatar for {event.name} is unchanged, not uploading it.")
+        else:
+            # we ignore type here since we will always try to edit the avatar
+            # only if the bot is logged in (self.bot.user is not None)
+            await self.bot.user.edit(avatar=avatar)  # type: ignore[not-none]
+            LOGGER.debug(f"Successfully edited the bot's avatar for {event.name}.")
+
+        await self._save_avatar_state(event.name, digest)
 
     @commands.command()
     @commands.is_owner()
@@ -198,3 +404,20 @@ class Avatar(commands.Cog):
         LOGGER.debug(f"Manually changing the bot's avatar for {event.name}.")
         await self.edit_avatar(event)
         await ctx.message.add_reaction("\N{WHITE HEAVY CHECK MARK}")
+
+    async def _get_avatar_state(self) -> AvatarState | None:
+        """Return the event and avatar that were last set, if any."""
+        async with self.bot.db.session() as session:
+            return await session.scalar(select(AvatarState).limit(1))
+
+    async def _save_avatar_state(self, event_name: str, avatar_digest: str) -> None:
+        """Save the event and the hash of the avatar that were set."""
+        async with self.bot.db.session() as session, session.begin():
+            state = await session.scalar(select(AvatarState).limit(1))
+            if state is None:
+                state = AvatarState()
+                session.add(state)
+
+            state.event_name = event_name
+            state.avatar_digest = avatar_digest
+            state.updated_at = discord.utils.utcnow()
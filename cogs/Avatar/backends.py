@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import aiohttp
+
+from .cache import FileCache
+
+if TYPE_CHECKING:
+    from snapcogs.bot import Bot
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Timeouts when downloading from the repository
+FETCH_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+
+
+class AvatarBackend(ABC):
+    """Source of the files of the HatBot-Avatar repository.
+
+    The files are identified by their path relative to the root of the
+    repository, like "config.toml" or "<event>/<file>".
+    """
+
+    @abstractmethod
+    async def fetch(self, path: str) -> bytes:
+        """Return the raw bytes of the file at the given path.
+
+        It might raise an exception if the file does not exist.
+        """
+
+
+class HttpBackend(AvatarBackend):
+    """Backend that downloads the files from the repository on GitHub."""
+
+    base_url = "https://raw.githubusercontent.com/Snaptraks/HatBot-Avatar/main"
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        base_url: str | None = None,
+        cache: FileCache | None = None,
+    ) -> None:
+        self.bot = bot
+        if base_url is not None:
+            self.base_url = base_url
+        self.cache = cache or FileCache()
+
+    async def fetch(self, path: str) -> bytes:
+        return await self.fetch_file(f"{self.base_url}/{path}")
+
+    async def fetch_file(self, download_url: str) -> bytes:
+        """Abstract downloading a file from the repository.
+
+        Get the file from the given URL and return the raw bytes.
+        The files are cached on disk, and only downloaded again if they changed
+        since the last time. If the repository cannot be reached, the cached file
+        is returned instead.
+        It might raise an exception in the case of an incorrect URL.
+        """
+        LOGGER.debug(f"Fetching {download_url}")
+        cached = await self.cache.get(download_url)
+        headers = {}
+        if cached is not None:
+            if cached.etag is not None:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified is not None:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        status: int | None = None
+        try:
+            async with self.bot.http_session.get(
+                download_url, headers=headers, timeout=FETCH_TIMEOUT
+            ) as response:
+                status = response.status
+                if status == 200:
+                    content = await response.read()
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+
+        except (aiohttp.ClientError, TimeoutError):
+            LOGGER.warning(f"Could not reach {download_url}.")
+            status = None
+
+        if status == 200:
+            LOGGER.debug("Fetched successfully.")
+            await self.cache.put(
+                download_url, content, etag=etag, last_modified=last_modified
+            )
+            return content
+
+        # not modified, or the repository is unavailable
+        if cached is not None and (status is None or status == 304 or status >= 500):
+            LOGGER.debug(f"Using cached file ({status=}).")
+            content = await self.cache.read(cached)
+            if content is not None:
+                return content
+
+        msg = f"Failed to fetch file (status {status})."
+        raise RuntimeError(msg)
+
+
+class LocalBackend(AvatarBackend):
+    """Backend that reads the files from a local checkout of the repository.
+
+    This allows running the avatar rotation offline, and testing it.
+    """
+
+    def __init__(self, root: Path | str) -> None:
+        self.root = Path(root).resolve()
+
+    async def fetch(self, path: str) -> bytes:
+        file_path = (self.root / path).resolve()
+        if not file_path.is_relative_to(self.root):
+            msg = f"{path} is outside of the repository."
+            raise RuntimeError(msg)
+
+        LOGGER.debug(f"Reading {file_path}")
+        try:
+            return await asyncio.to_thread(file_path.read_bytes)
+        except FileNotFoundError as e:
+            msg = f"Failed to read file {path}."
+            raise RuntimeError(msg) from e
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+LOGGER = logging.getLogger(__name__)
+
+# inside the hatbot-db volume, so it survives container rebuilds
+CACHE_PATH = Path("db") / "avatar_cache"
+
+
+@dataclass
+class CachedFile:
+    """Validators and content hash of a file downloaded previously."""
+
+    digest: str
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+def write_atomic(path: Path, content: bytes) -> None:
+    """Write the content to a temporary file and rename it over the path.
+
+    This prevents a crash in the middle of the write to leave a corrupted file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp_path.replace(path)
+
+
+class FileCache:
+    """On-disk cache of downloaded files, keyed by URL.
+
+    The content of the files is stored under its SHA-256 hash, and the ETag and
+    Last-Modified headers are kept to make conditional requests. The blobs that
+    no URL refers to anymore are removed.
+    The file operations are run in a thread, to not block the event loop.
+    """
+
+    def __init__(self, path: Path = CACHE_PATH) -> None:
+        self.path = path
+        self._index_path = path / "index.json"
+        self._blobs_path = path / "blobs"
+        self._index: dict[str, CachedFile] | None = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, url: str) -> CachedFile | None:
+        """Return the cached entry for the URL, or None if it is not cached."""
+        async with self._lock:
+            index = await self._get_index()
+        cached = index.get(url)
+        if cached is not None and not await asyncio.to_thread(
+            (self._blobs_path / cached.digest).exists
+        ):
+            LOGGER.warning(f"Cached file {cached.digest} is missing.")
+            return None
+
+        return cached
+
+    async def read(self, cached: CachedFile) -> bytes | None:
+        """Return the content of the cached file, or None if it is missing."""
+        blob_path = self._blobs_path / cached.digest
+        try:
+            return await asyncio.to_thread(blob_path.read_bytes)
+        except FileNotFoundError:
+            LOGGER.warning(f"Cached file {cached.digest} is missing.")
+            return None
+
+    async def put(
+        self,
+        url: str,
+        content: bytes,
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> CachedFile:
+        """Store the content of the file downloaded from the URL."""
+        digest = hashlib.sha256(content).hexdigest()
+        cached = CachedFile(digest=digest, etag=etag, last_modified=last_modified)
+
+        blob_path = self._blobs_path / digest
+        async with self._lock:
+            index = await self._get_index()
+            if not blob_path.exists():
+                await asyncio.to_thread(write_atomic, blob_path, content)
+
+            previous = index.get(url)
+            index[url] = cached
+            await self._save_index(index)
+
+            if previous is not None and all(
+                c.digest != previous.digest for c in index.values()
+            ):
+                LOGGER.debug(f"Removing the cached file {previous.digest}.")
+                await asyncio.to_thread(
+                    (self._blobs_path / previous.digest).unlink, missing_ok=True
+                )
+
+        LOGGER.debug(f"Cached {url} as {digest}.")
+        return cached
+
+    async def _save_index(self, index: dict[str, CachedFile]) -> None:
+        data = json.dumps({url: asdict(c) for url, c in index.items()}, indent=2)
+        await asyncio.to_thread(write_atomic, self._index_path, data.encode())
+
+    async def _get_index(self) -> dict[str, CachedFile]:
+        """Return the index of the cached files, loading it on first use.
+
+        The lock must be held, so no blob is written while the unused ones are
+        removed.
+        """
+        if self._index is None:
+            self._index = await asyncio.to_thread(self._load_index)
+            await asyncio.to_thread(self._remove_unused_blobs, self._index)
+        return self._index
+
+    def _load_index(self) -> dict[str, CachedFile]:
+        try:
+            with self._index_path.open("rb") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            LOGGER.exception("Could not read the avatar cache index, starting over.")
+            return {}
+
+        return {url: CachedFile(**cached) for url, cached in data.items()}
+
+    def _remove_unused_blobs(self, index: dict[str, CachedFile]) -> None:
+        """Remove the blobs left by replaced entries or interrupted writes."""
+        used = {cached.digest for cached in index.values()}
+        try:
+            blob_paths = list(self._blobs_path.iterdir())
+        except FileNotFoundError:
+            return
+
+        for blob_path in blob_paths:
+            if blob_path.name not in used:
+                LOGGER.debug(f"Removing the unused cached file {blob_path.name}.")
+                blob_path.unlink(missing_ok=True)
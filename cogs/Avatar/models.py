@@ -0,0 +1,14 @@
+import datetime
+
+from snapcogs.database import Base
+from sqlalchemy import DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class AvatarState(Base):
+    __tablename__ = "avatar_state"
+
+    event_name: Mapped[str]
+    # SHA-256 of the last uploaded avatar
+    avatar_digest: Mapped[str | None]
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
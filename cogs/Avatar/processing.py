@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+
+from PIL import Image, ImageOps
+
+LOGGER = logging.getLogger(__name__)
+
+# Size of the side of the avatar, in pixels
+AVATAR_SIZE = 512
+
+# Smallest size we accept to go down to when trying to fit the budget
+AVATAR_MIN_SIZE = 128
+
+# Maximum size of the avatar file, in bytes
+AVATAR_MAX_BYTES = 1024 * 1024
+
+# Change it when prepare_avatar gives a different result for the same image,
+# so that the avatars prepared before are prepared again
+PROCESSING_VERSION = 1
+
+
+def processing_key(content: bytes) -> str:
+    """Return a hash of the image and of the settings used to prepare it."""
+    settings = (PROCESSING_VERSION, AVATAR_SIZE, AVATAR_MIN_SIZE, AVATAR_MAX_BYTES)
+    return hashlib.sha256(repr(settings).encode() + content).hexdigest()
+
+
+def prepare_avatar(
+    content: bytes,
+    *,
+    size: int = AVATAR_SIZE,
+    max_bytes: int = AVATAR_MAX_BYTES,
+) -> bytes:
+    """Square-crop, resize and recompress the image to be used as an avatar.
+
+    The image is saved as an optimized PNG, quantized and then made smaller
+    until it fits in max_bytes. Animated images that already fit are returned
+    unchanged, otherwise only their first frame is kept.
+    This is CPU heavy, so it should be run in a thread.
+    """
+    with Image.open(io.BytesIO(content)) as image:
+        if getattr(image, "is_animated", False):
+            if len(content) <= max_bytes:
+                return content
+            LOGGER.warning("Animated avatar is too large, keeping the first frame.")
+
+        image.seek(0)
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        frame = image.convert("RGBA" if has_alpha else "RGB")
+
+    while True:
+        resized = ImageOps.fit(frame, (size, size), Image.Resampling.LANCZOS)
+        data = _save_png(resized)
+        if len(data) > max_bytes:
+            data = _save_png(resized.quantize(colors=256))
+
+        if len(data) <= max_bytes or size <= AVATAR_MIN_SIZE:
+            break
+
+        size = max(AVATAR_MIN_SIZE, size * 3 // 4)
+        LOGGER.debug(f"Avatar is too large ({len(data)} bytes), trying {size}px.")
+
+    if len(data) > max_bytes:
+        LOGGER.warning(f"Avatar is still {len(data)} bytes at {size}px.")
+
+    LOGGER.debug(
+        f"Prepared avatar of {len(data)} bytes at {size}px (from {len(content)} bytes)."
+    )
+    return data
+
+
+def _save_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
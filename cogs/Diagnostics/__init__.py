@@ -0,0 +1,7 @@
+from snapcogs.bot import Bot
+
+from .diagnostics import Diagnostics
+
+
+async def setup(bot: Bot) -> None:
+    await bot.add_cog(Diagnostics(bot))
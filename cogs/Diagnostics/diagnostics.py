@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from discord.ext import commands
+from tabulate import tabulate
+
+if TYPE_CHECKING:
+    from discord.ext.commands import Context
+    from snapcogs.bot import Bot
+
+    from ..utils.tracing import Tracer
+
+# Discord messages are limited to 2000 characters
+MESSAGE_LENGTH = 2000
+
+
+class Diagnostics(commands.Cog):
+    """Owner commands to look at how the Bot is doing."""
+
+    def __init__(self, bot: Bot) -> None:
+        self.bot = bot
+
+    async def cog_check(self, ctx: Context) -> bool:  # ty:ignore[invalid-method-override]
+        return await self.bot.is_owner(ctx.author)
+
+    @property
+    def tracer(self) -> Tracer | None:
+        return getattr(self.bot, "tracer", None)
+
+    @commands.command()
+    async def traces(self, ctx: Context, count: int = 10) -> None:
+        """Show the database activity of the last interactions and listeners.
+
+        Only the ones that ran at least one statement are kept.
+        """
+        if self.tracer is None:
+            await ctx.send("Tracing is not enabled.")
+            return
+
+        traces = list(self.tracer.traces)[-count:]
+        if not traces:
+            await ctx.send("No traces yet.")
+            return
+
+        rows = [
+            [
+                trace.started_at.strftime("%H:%M:%S"),
+                trace.name[:32],
+                trace.statements,
+                trace.sessions,
+                trace.commits,
+                f"{trace.db_time * 1000:.0f}",
+                f"{trace.duration * 1000:.0f}",
+                max(trace.shapes.values()),
+            ]
+            for trace in reversed(traces)
+        ]
+        table = tabulate(
+            rows,
+            headers=["Time", "Name", "Stmts", "Sess", "Commits", "DB ms", "ms", "Rep"],
+            tablefmt="presto",
+        )
+        # drop the oldest traces if the table is too long
+        lines = table.splitlines()
+        while len(lines) > 2 and sum(len(line) + 1 for line in lines) > (
+            MESSAGE_LENGTH - 8
+        ):
+            lines.pop()
+
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
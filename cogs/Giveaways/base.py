@@ -4,6 +4,20 @@ GIVEAWAY_TIME = timedelta(hours=24)
 # GIVEAWAY_TIME = timedelta(seconds=60)
 EMBED_COLOR = 0xB3000C
 
+# entries pressed within this delay are saved in the same transaction
+ENTRY_BATCH_INTERVAL = 0.25  # seconds
+
+# number of tries to claim a game when another giveaway claims it first
+GAME_CLAIM_ATTEMPTS = 5
+
+# games are imported in chunks, one statement and transaction per chunk
+IMPORT_CHUNK_SIZE = 5000  # games
+IMPORT_READ_SIZE = 64 * 1024  # bytes
+
+# failed notifications are retried after 2, 4, 8, ... seconds
+NOTIFICATION_MAX_ATTEMPTS = 8
+NOTIFICATION_BACKOFF = 2  # seconds
+
 HVC_STAFF_ROLES = [
     308050057977135114,  # Admin
     308053679796387851,  # Dev
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from sqlalchemy.dialects.sqlite import insert
+
+from .base import ENTRY_BATCH_INTERVAL
+from .models import Entry
+
+if TYPE_CHECKING:
+    from snapcogs.bot import Bot
+
+LOGGER = logging.getLogger(__name__)
+
+
+class EntryQueue:
+    """Group concurrent giveaway entries into a single transaction per tick.
+
+    When a giveaway is posted, a lot of members press the button within a few
+    seconds. Instead of running one transaction per entry, the entries are
+    queued and written together with an "INSERT ... ON CONFLICT DO NOTHING".
+    """
+
+    def __init__(self, bot: Bot, *, interval: float = ENTRY_BATCH_INTERVAL) -> None:
+        self.bot = bot
+        self.interval = interval
+        self._pending: list[tuple[int, int, asyncio.Future[bool]]] = []
+        self._flush_task: asyncio.Task | None = None
+        # a flush waits for the batch being written, if any
+        self._flush_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def add(self, user_id: int, giveaway_id: int) -> bool:
+        """Queue the entry and wait for its batch to be written.
+
+        Return True if the member was entered, or False if they already
+        entered this giveaway.
+        """
+        future: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+        self._pending.append((user_id, giveaway_id, future))
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+        return await future
+
+    async def _flush_loop(self) -> None:
+        """Flush the queue every tick, until no entries are pending."""
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write all the pending entries in one transaction.
+
+        When it returns, every entry queued before the call is written.
+        """
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        # the same member can press the button twice in the same tick
+        rows = list(
+            dict.fromkeys((giveaway_id, user_id) for user_id, giveaway_id, _ in batch)
+        )
+        LOGGER.debug(f"Saving {len(rows)} entries in one batch.")
+
+        try:
+            async with self.bot.db.session() as session, session.begin():
+                result = await session.execute(
+                    insert(Entry)
+                    .values(
+                        [
+                            {"giveaway_id": giveaway_id, "user_id": user_id}
+                            for giveaway_id, user_id in rows
+                        ]
+                    )
+                    .on_conflict_do_nothing(index_elements=["giveaway_id", "user_id"])
+                    .returning(Entry.giveaway_id, Entry.user_id)
+                )
+                inserted = set(result.tuples())
+
+        except Exception as e:
+            LOGGER.exception("Could not save the batch of entries.")
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for user_id, giveaway_id, future in batch:
+            if future.done():
+                # the caller went away (interaction cancelled, etc.)
+                continue
+            key = (giveaway_id, user_id)
+            future.set_result(key in inserted)
+            # a second press in the same batch counts as already entered
+            inserted.discard(key)
@@ -1,28 +1,45 @@
 import asyncio
-import json
 import logging
+import math
 import random
-from collections import Counter
+import time
+from collections.abc import AsyncIterator
 from datetime import date
+from typing import Any
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 from snapcogs.bot import Bot
 from snapcogs.utils.views import Confirm
-from sqlalchemy import asc, func, not_, select, update
+from sqlalchemy import asc, distinct, func, not_, select, update
 from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.exc import OperationalError
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import contains_eager, joinedload
 
-from ..utils.checks import NotOwner, is_owner
+from ..utils.checks import NotOwner, is_owner, is_owner_predicate
+from ..utils.database import read_session
 from .base import (
     EMBED_COLOR,
+    GAME_CLAIM_ATTEMPTS,
     GIVEAWAY_TIME,
     HVC_MC_SERVER_CHATTER,
     HVC_STAFF_ROLES,
+    IMPORT_CHUNK_SIZE,
 )
-from .models import Component, Entry, Game, Giveaway, View
+from .entries import EntryQueue
+from .importer import ImportReport, iter_json_array, iter_url, validate_game
+from .models import (
+    Component,
+    Entry,
+    Game,
+    Giveaway,
+    Notification,
+    NotificationKind,
+    View,
+)
+from .outbox import NotificationOutbox
+from .search import PrefixIndex
 from .views import GiveawayView
 
 LOGGER = logging.getLogger(__name__)
@@ -39,14 +56,45 @@ class Giveaways(commands.Cog):
 
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
-        self.persistent_views_loaded: bool = False
         self._tasks: dict[int, asyncio.Task] = {}
+        self.entries = EntryQueue(bot)
+        self.outbox = NotificationOutbox(bot)
+        self._remaining_stats: tuple[int, int] | None = None
+        self._remaining_pages: dict[tuple[int, int], list[tuple[str, int]]] = {}
+        # titles of the remaining games, and keys of the given games
+        self.title_index = PrefixIndex()
+        self.key_index = PrefixIndex()
+
+    async def cog_load(self) -> None:
+        # this runs once per load, unlike on_ready which runs on every reconnect
+        try:
+            await self.load_ongoing_giveaways()
+            await self.outbox.resume()
+            await self._build_search_indexes()
+        except OperationalError:
+            LOGGER.info(
+                f"Database tables for cog {self.__class__.__name__} do not exist yet."
+            )
 
     async def cog_unload(self) -> None:
         # cancel giveaways tasks when unloading to prevent duplicates
         for t in self._tasks.values():
             t.cancel()
 
+        # save the entries still waiting in the queue
+        await self.entries.flush()
+
+        # undelivered notifications will be resumed when the cog is loaded again
+        self.outbox.close()
+
+    def queue_depths(self) -> dict[str, int]:
+        """Return the number of items waiting in each queue, for the metrics."""
+        return {
+            "entries": len(self.entries),
+            "notifications": len(self.outbox),
+            "giveaways": len(self._tasks),
+        }
+
     async def interaction_check(self, interaction: discord.Interaction) -> bool:  # ty:ignore[invalid-method-override]
         """Check to make sure commands for this Cog are only run in servers we want."""
         name = getattr(interaction.command, "qualified_name", "Unknown")
@@ -59,38 +107,52 @@ class Giveaways(commands.Cog):
             return False
         return interaction.guild.id in guild_ids
 
-    @commands.Cog.listener()
-    async def on_ready(self) -> None:
-        if not self.persistent_views_loaded:
-            try:
-                await self.load_ongoing_giveaways()
-                self.persistent_views_loaded = True
-            except OperationalError:
-                LOGGER.info(
-                    f"Database tables for cog {self.__class__.__name__} "
-                    "do not exist yet."
-                )
-
     async def load_ongoing_giveaways(self) -> None:
-        for giveaway in await self._get_ongoing_giveaways():
+        """Restore the views and tasks of the giveaways that are not done yet.
+
+        All the views are registered first, so the buttons work even before the
+        tasks of the giveaways are started.
+        """
+        start = time.perf_counter()
+        restored: list[tuple[Giveaway, GiveawayView]] = []
+
+        for giveaway, view_model in await self._get_ongoing_giveaways():
+            if view_model is None:
+                LOGGER.warning(f"No view saved for Giveaway {giveaway.id}, skipping.")
+                continue
+
             LOGGER.debug(f"Loading view for message {giveaway.message_id}")
+            view = GiveawayView(
+                self.bot,
+                giveaway,
+                components_id={c.name: c.component_id for c in view_model.components},
+            )
+            self.bot.add_view(view, message_id=giveaway.message_id)
+            restored.append((giveaway, view))
 
+        for giveaway, view in restored:
             self._tasks[giveaway.id] = asyncio.create_task(
                 self.giveaway_task(
                     interaction=None,
                     giveaway=giveaway,
+                    view=view,
                 )
             )
 
+        elapsed = time.perf_counter() - start
+        LOGGER.info(f"Restored {len(restored)} giveaways in {elapsed * 1000:.1f} ms.")
+
     async def giveaway_task(
         self,
         *,
         interaction: discord.Interaction | None,
         giveaway: Giveaway,
+        view: GiveawayView | None = None,
     ) -> None:
         """Handle the giveaways.
 
         This is the main task that is called whens tarting a giveaway.
+        When restoring a giveaway, the interaction is None and its view is given.
         """
         ends_in = discord.utils.format_dt(giveaway.trigger_at, style="R")
         ends_at = discord.utils.format_dt(giveaway.trigger_at, style="F")
@@ -117,15 +179,16 @@ class Giveaways(commands.Cog):
             giveaway.message_id = original_message.id
             giveaway = await self._save_giveaway(giveaway)
 
-        else:
-            view = await self._get_view(giveaway)
-            self.bot.add_view(view, message_id=giveaway.message_id)
+        assert view is not None
 
         LOGGER.debug(f"Sleeping for giveaway {giveaway.id}")
         await discord.utils.sleep_until(giveaway.trigger_at)
         view.stop()
+        # the entries of the last tick must be counted and drawn too
+        await self.entries.flush()
 
         winner = await self._get_random_winner(giveaway)
+        notifications: list[Notification] = []
 
         if winner is None:
             LOGGER.info(
@@ -143,26 +206,22 @@ class Giveaways(commands.Cog):
 
         else:
             LOGGER.info(f"Sending game key for {giveaway.game.title} to {winner}")
-            try:
-                # sending message to winner
-                await winner.send(
-                    f"Congratulations! You won the giveaway for "
-                    f"**{game_title_link}**!\n"
-                    f"Your Steam key is ||{giveaway.game.key}|| ."
+            notifications.append(
+                Notification(
+                    kind=NotificationKind.USER_DM,
+                    target_id=winner.id,
+                    content=(
+                        f"Congratulations! You won the giveaway for "
+                        f"**{game_title_link}**!\n"
+                        f"Your Steam key is ||{giveaway.game.key}|| ."
+                    ),
+                    fallback_content=(
+                        f"Could not DM {winner.display_name} "
+                        f"({winner.mention}). They won the giveaway for "
+                        f"**{giveaway.game.title}** with key ||{giveaway.game.key}||."
+                    ),
                 )
-            except discord.Forbidden:
-                # cannot send to winner, sending message to bot owner
-                LOGGER.info(
-                    f"Could not send message to {winner}, sending to bot owner."
-                )
-                app_info = await self.bot.application_info()
-                await app_info.owner.send(
-                    f"Could not DM {winner.display_name} "
-                    f"({winner.mention}). They won the giveaway for "
-                    f"**{giveaway.game.title}** with key ||{giveaway.game.key}||."
-                )
-
-            LOGGER.info(f"Key sent to {winner}, editing original message")
+            )
 
             embed = discord.Embed(
                 color=EMBED_COLOR,
@@ -176,25 +235,30 @@ class Giveaways(commands.Cog):
             ).set_footer(text=f"{await self._count_entries(giveaway.id)} entries")
 
             # send to mc-server-chatter
-            mc_server_chatter = self.bot.get_partial_messageable(HVC_MC_SERVER_CHATTER)
-            try:
-                await mc_server_chatter.send(
-                    f"{winner.display_name} has won {giveaway.game.title} "
-                    "on the Discord server! You should join for a chance to win too ;)"
+            notifications.append(
+                Notification(
+                    kind=NotificationKind.CHANNEL_MESSAGE,
+                    target_id=HVC_MC_SERVER_CHATTER,
+                    content=(
+                        f"{winner.display_name} has won {giveaway.game.title} "
+                        "on the Discord server! "
+                        "You should join for a chance to win too ;)"
+                    ),
                 )
-            except discord.DiscordException:
-                LOGGER.info("Could not send to mc-server-chatter")
-
-        await self._end_giveaway(giveaway)
+            )
 
         # the following attributes should never be None
-        channel = self.bot.get_partial_messageable(giveaway.channel_id)  # type: ignore[not-none]
-        message = channel.get_partial_message(giveaway.message_id)  # type: ignore[not-none]
+        notifications.append(
+            Notification(
+                kind=NotificationKind.EDIT_MESSAGE,
+                target_id=giveaway.channel_id,  # type: ignore[not-none]
+                message_id=giveaway.message_id,
+                embed=embed.to_dict(),
+            )
+        )
 
-        try:
-            await message.edit(embed=embed, view=None)
-        except Exception:
-            LOGGER.exception("There was an unhandled exception")
+        await self._end_giveaway(giveaway, notifications)
+        self.outbox.deliver(notifications)
 
     @giveaway.command(name="add")
     @app_commands.describe(attachment="A JSON file with the games' info")
@@ -207,14 +271,26 @@ class Giveaways(commands.Cog):
         A file must be attached to the command when running it.
         This is an Owner Only command, as only the bot's owner can run it.
         """
-        content = await attachment.read()
-        games_data: list[dict[str, str]] = json.loads(content)
+        # importing a big bundle of keys can take more than a few seconds
+        await interaction.response.defer(ephemeral=True, thinking=True)
 
-        LOGGER.debug(f"Adding {len(games_data)} games to the database.")
-        await self._insert_games(games_data)
+        records = iter_json_array(iter_url(self.bot.http_session, attachment.url))
+        report = ImportReport()
+        try:
+            await self._insert_games(records, report)
+        except ValueError:
+            LOGGER.exception(f"Could not read the games from {attachment.filename}.")
+            await interaction.followup.send(
+                "I could not read the whole file, is it a valid JSON array?\n"
+                "The keys read before the error are already in the database:\n"
+                f"{report.summary()}",
+                ephemeral=True,
+            )
+            return
 
-        await interaction.response.send_message(
-            f"Thank you! I received {len(games_data)} keys and updated the database.",
+        await interaction.followup.send(
+            f"Thank you! I received {report.total} keys and updated the database.\n"
+            f"{report.summary()}",
             ephemeral=True,
         )
 
@@ -241,6 +317,20 @@ class Giveaways(commands.Cog):
                 "Adding back the key to the giveaway!", ephemeral=True
             )
 
+    @giveaway_readd.autocomplete("key")
+    async def giveaway_readd_key_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ) -> list[app_commands.Choice[str]]:
+        """Suggest the keys of the given games, only to the bot's owner."""
+        # checks do not run for autocomplete, and the keys are secret
+        if not await is_owner_predicate(interaction):
+            return []
+
+        return [
+            app_commands.Choice(name=key, value=key)
+            for key in self.key_index.search(current)
+        ]
+
     @giveaway_add.error
     @giveaway_readd.error
     async def giveaway_add_error(
@@ -258,27 +348,37 @@ class Giveaways(commands.Cog):
             interaction.extras["error_handled"] = False
 
     @giveaway.command(name="remaining")
-    @app_commands.describe(page="Page number to display")
+    @app_commands.describe(
+        page="Page number to display",
+        title="Title of a game to look up",
+    )
     @app_commands.checks.has_any_role(*HVC_STAFF_ROLES)
     async def giveaway_remaining(
-        self, interaction: discord.Interaction, page: int = 1
+        self, interaction: discord.Interaction, page: int = 1, title: str | None = None
     ) -> None:
         """List the remaining games for the giveaway."""
-        remaining_games = await self._get_remaining_games()
-        n_remaining_games = len(remaining_games)
-        games_counter = Counter([game.title for game in remaining_games])
-        per_page = 15
+        if title is not None:
+            titles = self.title_index.complete(title) or [title]
+            await interaction.response.send_message(
+                "\n".join(
+                    f"`{self.title_index.count(match):2d} x` {match}"
+                    for match in titles
+                ),
+                ephemeral=True,
+            )
+            return
 
-        games_list = [
-            f"`{amount:2d} x` {title}" for title, amount in games_counter.items()
-        ]
-        max_pages = len(games_list) // per_page + 1
+        n_remaining_games, n_titles = await self._get_remaining_stats()
+        per_page = 15
+        max_pages = max(math.ceil(n_titles / per_page), 1)
 
         page = min(page, max_pages)
         page = max(page, 1)
 
-        i = (page - 1) * per_page
-        j = page * per_page
+        games_list = [
+            f"`{amount:2d} x` {title}"
+            for title, amount in await self._get_remaining_titles(page, per_page)
+        ]
         today = discord.utils.utcnow().date()
         dec_31 = date(today.year, 12, 31)
         days_until_dec_31 = dec_31 - today
@@ -288,11 +388,10 @@ class Giveaways(commands.Cog):
         )
         embed = discord.Embed(
             title=(
-                f"{n_remaining_games} Remaining Games / "
-                f"{len(games_counter)} Individual Titles"
+                f"{n_remaining_games} Remaining Games / {n_titles} Individual Titles"
             ),
             color=EMBED_COLOR,
-            description="\n".join(games_list[i:j]),
+            description="\n".join(games_list),
         ).set_footer(
             text=f"Page {page}/{max_pages}",
         )
@@ -301,12 +400,24 @@ class Giveaways(commands.Cog):
             content=content, embed=embed, ephemeral=True
         )
 
-    @giveaway.command(name="start")
+    @giveaway_remaining.autocomplete("title")
+    async def giveaway_remaining_title_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ) -> list[app_commands.Choice[str]]:
+        """Suggest the titles of the remaining games."""
+        # values are limited to 100 characters, giveaway_remaining completes them
+        return [
+            app_commands.Choice(name=title[:100], value=title[:100])
+            for title in self.title_index.search(current)
+        ]
+
+    # the giveaway post must stay public, even if the deferral is needed
+    @giveaway.command(name="start", extras={"defer_ephemeral": False})
     @app_commands.checks.cooldown(10, 10 * 60, key=None)  # 10 calls per 10 mionutes
     @app_commands.checks.has_any_role(*HVC_STAFF_ROLES)
     async def giveaway_start(self, interaction: discord.Interaction) -> None:
         """Start one Giveaway event."""
-        game = await self._get_random_game()
+        game = await self._claim_random_game()
         if game is None:
             await interaction.response.send_message(
                 "No more games! Sorry!", ephemeral=True
@@ -327,18 +438,26 @@ class Giveaways(commands.Cog):
             )
         )
 
-    async def _get_ongoing_giveaways(self) -> list[Giveaway]:
-        """Return the list of Giveaways that are not done yet."""
+    async def _get_ongoing_giveaways(self) -> list[tuple[Giveaway, View | None]]:
+        """Return the Giveaways that are not done yet, with their View."""
         async with self.bot.db.session() as session:
-            giveaways = await session.scalars(
-                select(Giveaway)
+            result = await session.execute(
+                select(Giveaway, View)
+                .outerjoin(
+                    View,
+                    View.message_id == Giveaway.message_id,
+                )
+                .outerjoin(
+                    View.components,
+                )
                 .where(not_(Giveaway.is_done))
                 .options(
                     joinedload(Giveaway.game),
+                    contains_eager(View.components),
                 )
             )
 
-        return list(giveaways)
+        return list(result.unique().tuples())
 
     async def _save_giveaway(self, giveaway: Giveaway) -> Giveaway:
         """Save the Giveaway information to the database."""
@@ -349,116 +468,332 @@ class Giveaways(commands.Cog):
 
         return giveaway
 
-    async def _end_giveaway(self, giveaway: Giveaway) -> None:
-        """Mark the Giveaway as done."""
+    async def _end_giveaway(
+        self, giveaway: Giveaway, notifications: list[Notification]
+    ) -> None:
+        """Mark the Giveaway as done, and save the notifications to deliver."""
         async with self.bot.db.session() as session, session.begin():
             giveaway.is_done = True
             session.add(giveaway)
+            await session.flush()
+
+            for notification in notifications:
+                notification.giveaway_id = giveaway.id
+            session.add_all(notifications)
 
         LOGGER.debug(f"Giveaway {giveaway.id} for {giveaway.game.title} ended.")
 
-    async def _get_random_game(self) -> Game | None:
-        """Return a random game that is not given yet.
+    async def _claim_random_game(self) -> Game | None:
+        """Mark a random game that is not given yet as given, and return it.
 
+        A random ID is picked between the lowest and highest IDs of the available
+        games, and the first available game from there is claimed with a single
+        conditional UPDATE, so two giveaways can never receive the same key.
         If None is returned, it means there are no available games yet.
         """
-        async with self.bot.db.session() as session:
-            game = await session.scalar(
-                select(Game)
-                .where(
-                    not_(Game.given),
+        for attempt in range(1, GAME_CLAIM_ATTEMPTS + 1):
+            async with self.bot.db.session() as session, session.begin():
+                low, high = (
+                    await session.execute(
+                        select(func.min(Game.id), func.max(Game.id)).where(
+                            not_(Game.given),
+                        )
+                    )
+                ).one()
+
+                if low is None:
+                    LOGGER.debug("No game available to claim.")
+                    return None
+
+                pivot = random.randint(low, high)
+                candidate = (
+                    select(Game.id)
+                    .where(
+                        not_(Game.given),
+                        Game.id >= pivot,
+                    )
+                    .order_by(
+                        asc(Game.id),
+                    )
+                    .limit(1)
+                    .scalar_subquery()
                 )
-                .order_by(
-                    func.random(),
+                game = await session.scalar(
+                    update(Game)
+                    .where(
+                        Game.id == candidate,
+                        not_(Game.given),
+                    )
+                    .values(
+                        given=True,
+                    )
+                    .returning(Game)
+                    .execution_options(synchronize_session=False)
                 )
-                .limit(1)
-            )
 
-        LOGGER.debug(f"Randomly selected Game {game}")
+            if game is not None:
+                LOGGER.debug(f"Claimed Game {game}")
+                self._invalidate_remaining_games()
+                self._update_search_indexes(game, given=True)
+                return game
 
-        if game is not None:
-            await self._edit_game(game, given=True)
+            LOGGER.debug(f"Game was claimed by someone else ({attempt=}), retrying.")
 
-        return game
+        LOGGER.warning(f"Could not claim a game after {GAME_CLAIM_ATTEMPTS} attempts.")
+        return None
 
     async def _edit_game(self, game: Game, *, given: bool) -> None:
         """Mark the game as given (or not, if no one wins it)."""
+        was_given = game.given
         async with self.bot.db.session() as session, session.begin():
             game.given = given
             session.add(game)
 
+        self._invalidate_remaining_games()
+        if given != was_given:
+            self._update_search_indexes(game, given=given)
+
         LOGGER.debug(f"Edited Game {game.id} ({game.title}) as {given=}.")
 
-    async def _get_remaining_games(self) -> list[Game]:
-        """Return the list of remaining games."""
-        async with self.bot.db.session() as session:
-            games = await session.scalars(
-                select(Game)
-                .where(
-                    not_(Game.given),
-                )
-                .order_by(
-                    asc(Game.title),
+    async def _get_remaining_stats(self) -> tuple[int, int]:
+        """Return the number of remaining games and of individual titles.
+
+        The result is cached until the games are edited.
+        """
+        if self._remaining_stats is None:
+            async with read_session(self.bot) as session:
+                n_games, n_titles = (
+                    await session.execute(
+                        select(func.count(), func.count(distinct(Game.title))).where(
+                            not_(Game.given),
+                        )
+                    )
+                ).one()
+            self._remaining_stats = (n_games, n_titles)
+
+        return self._remaining_stats
+
+    async def _get_remaining_titles(
+        self, page: int, per_page: int
+    ) -> list[tuple[str, int]]:
+        """Return one page of (title, amount) of the remaining games.
+
+        The result is cached until the games are edited.
+        """
+        cache_key = (page, per_page)
+        if cache_key not in self._remaining_pages:
+            async with read_session(self.bot) as session:
+                titles = await session.execute(
+                    select(Game.title, func.count())
+                    .where(
+                        not_(Game.given),
+                    )
+                    .group_by(
+                        Game.title,
+                    )
+                    .order_by(
+                        asc(Game.title),
+                    )
+                    .limit(per_page)
+                    .offset((page - 1) * per_page)
                 )
-            )
+            self._remaining_pages[cache_key] = list(titles.tuples())
+
+        return self._remaining_pages[cache_key]
+
+    def _invalidate_remaining_games(self) -> None:
+        """Clear the cached stats of the remaining games after an edit."""
+        self._remaining_stats = None
+        self._remaining_pages.clear()
+
+    async def _insert_games(
+        self, records: AsyncIterator[Any], report: ImportReport
+    ) -> None:
+        """Add a stream of games and keys to the database.
+
+        The records are validated one by one, and the valid games are inserted
+        in chunks of IMPORT_CHUNK_SIZE, with one transaction per chunk. The
+        report is updated as the chunks are committed, so it tells what was
+        saved if the stream raises an error.
+        """
+        chunk: dict[str, dict[str, str]] = {}
+
+        async for record in records:
+            game_data = validate_game(record)
+            if game_data is None:
+                report.invalid += 1
+                continue
+
+            if game_data["key"] in chunk:
+                report.duplicates += 1
+                continue
+
+            chunk[game_data["key"]] = game_data
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                await self._insert_games_chunk(chunk, report)
+                chunk = {}
 
-        return list(games)
+        if chunk:
+            await self._insert_games_chunk(chunk, report)
 
-    async def _insert_games(self, games_data: list[dict[str, str]]) -> None:
-        """Add a list of games and keys to the database."""
-        # this is the least hackish way I could find that actually works.
-        # this is a limitation qith SQLAlchemy where the "ON CONFLICT IGNORE"
-        # is not well implemented in the ORM
+        LOGGER.debug(f"Imported games: {report}")
+
+    async def _insert_games_chunk(
+        self, games_data: dict[str, dict[str, str]], report: ImportReport
+    ) -> None:
+        """Add one chunk of games, mapped by their key, to the database."""
         async with self.bot.db.session() as session, session.begin():
-            for game_data in games_data:
-                await session.execute(
-                    insert(Game)
-                    .values(
-                        key=game_data["key"],
-                        title=game_data["title"],
-                        url=game_data["url"],
+            existing = set(
+                await session.scalars(
+                    select(Game.key).where(
+                        Game.key.in_(games_data),
                     )
+                )
+            )
+            new_games = [
+                game_data
+                for key, game_data in games_data.items()
+                if key not in existing
+            ]
+
+            inserted = 0
+            if new_games:
+                # keys can still be added between the lookup and the insert
+                result = await session.execute(
+                    insert(Game)
+                    .values(new_games)
                     .on_conflict_do_nothing(index_elements=["key"])
+                    .returning(Game.title)
                 )
+                inserted_titles = list(result.scalars())
+                inserted = len(inserted_titles)
+
+        if inserted:
+            self._invalidate_remaining_games()
+            for title in inserted_titles:
+                self.title_index.add(title)
+        report.inserted += inserted
+        report.duplicates += len(games_data) - inserted
 
     async def _re_add_game_key(self, key: str) -> None:
         """Mark the game key as not given."""
         async with self.bot.db.session() as session, session.begin():
-            await session.execute(
+            game = await session.scalar(
                 update(Game)
                 .where(
                     Game.key == key,
+                    Game.given,
                 )
                 .values(
                     given=False,
                 )
+                .returning(Game)
+                .execution_options(synchronize_session=False)
             )
+
+        if game is not None:
+            self._invalidate_remaining_games()
+            self._update_search_indexes(game, given=False)
         LOGGER.debug(f"Marked the key {key} as given=False.")
 
+    async def _build_search_indexes(self) -> None:
+        """Build the search indexes of titles and keys from the database."""
+        async with self.bot.db.session() as session:
+            titles = await session.scalars(
+                select(Game.title).where(
+                    not_(Game.given),
+                )
+            )
+            title_index = PrefixIndex(titles)
+
+            keys = await session.scalars(
+                select(Game.key).where(
+                    Game.given,
+                )
+            )
+            key_index = PrefixIndex(keys)
+
+        self.title_index, self.key_index = title_index, key_index
+        LOGGER.debug(
+            f"Built search indexes with {len(title_index)} titles "
+            f"and {len(key_index)} keys."
+        )
+
+    def _update_search_indexes(self, game: Game, *, given: bool) -> None:
+        """Move the game between the search indexes when it is given or added back."""
+        if given:
+            self.title_index.remove(game.title)
+            self.key_index.add(game.key)
+        else:
+            self.title_index.add(game.title)
+            self.key_index.remove(game.key)
+
     async def _get_random_winner(self, giveaway: Giveaway) -> discord.User | None:
         """Return one random entry for the giveaway."""
+        winners = await self._get_random_winners(giveaway, k=1)
+        return winners[0] if winners else None
+
+    async def _get_random_winners(
+        self, giveaway: Giveaway, k: int = 1
+    ) -> list[discord.User]:
+        """Return up to k distinct random winners for the giveaway.
+
+        Entries are drawn one at a time by their position in the giveaway, so only
+        the drawn entries are loaded. If the user of an entry cannot be found,
+        another entry is drawn instead.
+        """
+        n_entries = await self._count_entries(giveaway.id)
+        LOGGER.debug(f"Selecting {k} random winners from {n_entries} entries.")
+
+        drawn: set[int] = set()
+        winners: list[discord.User] = []
+        while len(winners) < k and len(drawn) < n_entries:
+            offset = random.randrange(n_entries)
+            if offset in drawn:
+                continue
+            drawn.add(offset)
+
+            user_id = await self._get_entry_user_id(giveaway.id, offset)
+            if user_id is None:
+                continue
+
+            user = await self._resolve_user(user_id)
+            if user is None:
+                LOGGER.info(f"Could not find user {user_id}, drawing another entry.")
+                continue
+
+            winners.append(user)
+
+        return winners
+
+    async def _get_entry_user_id(self, giveaway_id: int, offset: int) -> int | None:
+        """Return the user ID of the entry at the given position in the giveaway."""
         async with self.bot.db.session() as session:
-            entries = await session.scalars(
-                select(Entry)
+            return await session.scalar(
+                select(Entry.user_id)
                 .where(
-                    Entry.giveaway_id == giveaway.id,
+                    Entry.giveaway_id == giveaway_id,
                 )
                 .order_by(
-                    func.random(),
+                    asc(Entry.id),
                 )
+                .offset(offset)
+                .limit(1)
             )
 
-        entries = list(entries)
+    async def _resolve_user(self, user_id: int) -> discord.User | None:
+        """Return the user from the cache or the API, or None if it does not exist."""
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            return user
 
-        if len(entries) == 0:
+        try:
+            return await self.bot.fetch_user(user_id)
+        except discord.NotFound:
+            return None
+        except discord.HTTPException:
+            LOGGER.exception(f"Could not fetch user {user_id}.")
             return None
-
-        LOGGER.debug(f"Selecting a random winner from {len(entries)} entries.")
-        winning_entry = random.choice(entries)
-
-        return self.bot.get_user(winning_entry.user_id) or await self.bot.fetch_user(
-            winning_entry.user_id
-        )
 
     async def _save_presistent_view(
         self, view: GiveawayView, message: discord.InteractionMessage
@@ -477,42 +812,20 @@ class Giveaways(commands.Cog):
             )
             session.add(model_view)
 
-    async def _get_view(self, giveaway: Giveaway) -> GiveawayView:
-        """Get the View associated with the Giveaway."""
-        async with self.bot.db.session() as session:
-            view_model = await session.scalar(
-                select(View)
-                .where(
-                    View.message_id == giveaway.message_id,
-                )
-                .options(
-                    joinedload(View.components),
-                )
-            )
-
-        return GiveawayView(
-            self.bot,
-            giveaway,
-            components_id={c.name: c.component_id for c in view_model.components},  # type: ignore[not-none]
-        )
-
     async def _add_entry(
         self, user: discord.User | discord.Member, giveaway_id: int
-    ) -> None:
-        """Add the entry to the DB."""
+    ) -> bool:
+        """Add the entry to the DB.
+
+        Return True if the user was entered, or False if they already were.
+        """
         LOGGER.debug(f"Saving entry for Giveaway {giveaway_id} for {user}.")
-        async with self.bot.db.session() as session, session.begin():
-            session.add(
-                Entry(
-                    user_id=user.id,
-                    giveaway_id=giveaway_id,
-                )
-            )
+        return await self.entries.add(user.id, giveaway_id)
 
     async def _count_entries(self, giveaway_id: int) -> int:
         """Count the number of entries for the current giveaway."""
         LOGGER.debug(f"Counting entries for Giveaway {giveaway_id}.")
-        async with self.bot.db.session() as session:
+        async with read_session(self.bot) as session:
             entries = await session.scalar(
                 select(func.count())
                 .select_from(Entry)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from .base import IMPORT_READ_SIZE
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from aiohttp import ClientSession
+
+GAME_FIELDS = ("key", "title", "url")
+
+# whitespace allowed between the tokens of a JSON document
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# characters that can continue a JSON number, like "1." or "1e" before "5"
+NUMBER_CHARS = re.compile(r"[-+.eE0-9]*")
+
+
+@dataclass
+class ImportReport:
+    """Summary of an import of games in the database."""
+
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.duplicates + self.invalid
+
+    def summary(self) -> str:
+        return (
+            f"- {self.inserted} new keys\n"
+            f"- {self.duplicates} keys already in the database\n"
+            f"- {self.invalid} invalid entries"
+        )
+
+
+async def iter_url(
+    session: ClientSession, url: str, *, size: int = IMPORT_READ_SIZE
+) -> AsyncIterator[bytes]:
+    """Download the file at the given URL, yielding it in chunks of bytes."""
+    async with session.get(url) as response:
+        response.raise_for_status()
+        async for chunk in response.content.iter_chunked(size):
+            yield chunk
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Parse a JSON array incrementally, yielding its items one at a time.
+
+    Only the item being parsed is kept in memory, not the whole document.
+    Raise a ValueError if the document is not a valid JSON array, including
+    trailing commas and data after the closing bracket.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    # index of the first character of the buffer that was not parsed yet
+    pos = 0
+    started = False
+    ended = False
+    expect_item = True
+    after_comma = False
+    eof = False
+    source = aiter(chunks)
+
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()  # type: ignore[union-attr]
+
+        if pos < len(buffer):
+            char = buffer[pos]
+            if ended:
+                msg = "Unexpected data after the JSON array."
+                raise ValueError(msg)
+
+            if not started:
+                if char != "[":
+                    msg = "Expected a JSON array."
+                    raise ValueError(msg)
+                started = True
+                pos += 1
+                continue
+
+            if char == "]":
+                if after_comma:
+                    msg = "Expected an item after ',' in the JSON array."
+                    raise ValueError(msg)
+                ended = True
+                pos += 1
+                continue
+
+            if not expect_item:
+                if char != ",":
+                    msg = "Expected ',' between items of the JSON array."
+                    raise ValueError(msg)
+                expect_item = after_comma = True
+                pos += 1
+                continue
+
+            # a number at the end of the buffer might not be complete yet
+            partial_number = (
+                char in "-0123456789"
+                and NUMBER_CHARS.fullmatch(buffer, pos) is not None
+            )
+            if eof or not partial_number:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # the item is probably not complete yet
+                    if eof:
+                        raise
+                else:
+                    yield item
+                    pos = end
+                    expect_item = after_comma = False
+                    continue
+
+        if eof:
+            if ended:
+                return
+            msg = "Unexpected end of the JSON array."
+            raise ValueError(msg)
+
+        # drop the parsed items once per chunk read, not once per item
+        buffer = buffer[pos:]
+        pos = 0
+        try:
+            buffer += utf8.decode(await anext(source))
+        except StopAsyncIteration:
+            buffer += utf8.decode(b"", final=True)
+            eof = True
+
+
+def validate_game(record: Any) -> dict[str, str] | None:  # noqa: ANN401
+    """Return the game's info if the record is valid, else return None.
+
+    A valid record is an object with non-empty strings for key, title and url.
+    """
+    if not isinstance(record, dict):
+        return None
+
+    game: dict[str, str] = {}
+    for field in GAME_FIELDS:
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        game[field] = value.strip()
+
+    return game
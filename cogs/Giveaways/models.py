@@ -1,10 +1,18 @@
 from datetime import datetime
+from enum import Enum, auto
+from typing import Any
 
 from snapcogs.database import Base
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy import JSON, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 
+class NotificationKind(Enum):
+    USER_DM = auto()
+    CHANNEL_MESSAGE = auto()
+    EDIT_MESSAGE = auto()
+
+
 class View(Base):
     __tablename__ = "giveaways_view"
 
@@ -16,6 +24,7 @@ class View(Base):
 
 class Component(Base):
     __tablename__ = "giveaways_component"
+    __table_args__ = (Index("ix_giveaways_component_view_id", "view_id"),)
 
     name: Mapped[str]
     component_id: Mapped[str]
@@ -28,6 +37,11 @@ class Component(Base):
 
 class Game(Base):
     __tablename__ = "giveaways_game"
+    __table_args__ = (
+        # used to count the remaining games per title, and to find the games
+        # that are not given yet by id, since SQLite appends the id to indexes
+        Index("ix_giveaways_game_given_title", "given", "title"),
+    )
 
     key: Mapped[str] = mapped_column(unique=True)
     title: Mapped[str]
@@ -54,7 +68,33 @@ class Giveaway(Base):
 
 class Entry(Base):
     __tablename__ = "giveaways_entry"
-    __table_args__ = (UniqueConstraint("giveaway_id", "user_id"),)
+    __table_args__ = (
+        UniqueConstraint("giveaway_id", "user_id"),
+        # used to pick the winners by their position in the giveaway
+        Index("ix_giveaways_entry_giveaway_id_id", "giveaway_id", "id"),
+    )
 
     user_id: Mapped[int]
     giveaway_id: Mapped[int] = mapped_column(ForeignKey("giveaways_giveaway.id"))
+
+
+class Notification(Base):
+    """A message to deliver when a giveaway ends.
+
+    Notifications are saved in the same transaction that ends the giveaway,
+    and marked as delivered once sent, so they can be resumed after a restart.
+    """
+
+    __tablename__ = "giveaways_notification"
+
+    giveaway_id: Mapped[int] = mapped_column(ForeignKey("giveaways_giveaway.id"))
+    kind: Mapped[NotificationKind]
+    # user ID for USER_DM, channel ID otherwise
+    target_id: Mapped[int]
+    message_id: Mapped[int | None]
+    content: Mapped[str | None]
+    # sent to the bot owner if the user cannot be DMed
+    fallback_content: Mapped[str | None]
+    embed: Mapped[dict[str, Any] | None] = mapped_column(JSON)
+    attempts: Mapped[int] = mapped_column(default=0)
+    delivered: Mapped[bool] = mapped_column(default=False)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+import aiohttp
+import discord
+from sqlalchemy import not_, select, update
+
+from .base import NOTIFICATION_BACKOFF, NOTIFICATION_MAX_ATTEMPTS
+from .models import Notification, NotificationKind
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from snapcogs.bot import Bot
+
+LOGGER = logging.getLogger(__name__)
+
+
+class NotificationOutbox:
+    """Deliver the notifications of ended giveaways.
+
+    Each notification is sent concurrently with the others, and retried with an
+    exponential backoff if it fails, so a slow or failing call does not delay
+    the rest. Undelivered notifications are resumed after a restart.
+    """
+
+    def __init__(self, bot: Bot) -> None:
+        self.bot = bot
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def deliver(self, notifications: Iterable[Notification]) -> None:
+        """Start delivering the notifications in the background."""
+        for notification in notifications:
+            if notification.id in self._tasks:
+                # already being delivered
+                continue
+
+            self._tasks[notification.id] = asyncio.create_task(
+                self._deliver(notification)
+            )
+
+    async def resume(self) -> None:
+        """Start delivering the notifications that were not delivered yet."""
+        notifications = await self._get_pending_notifications()
+        if notifications:
+            LOGGER.info(f"Resuming delivery of {len(notifications)} notifications.")
+        self.deliver(notifications)
+
+    def close(self) -> None:
+        """Stop delivering, the notifications will be resumed on next load."""
+        for task in self._tasks.values():
+            task.cancel()
+
+    async def _deliver(self, notification: Notification) -> None:
+        """Send the notification, retrying it if it fails."""
+        try:
+            while notification.attempts < NOTIFICATION_MAX_ATTEMPTS:
+                try:
+                    await self._send(notification)
+
+                except (discord.NotFound, discord.Forbidden):
+                    # retrying will not change anything
+                    LOGGER.exception(f"Could not deliver {notification.kind.name}.")
+                    await self._mark_attempt(notification, give_up=True)
+                    return
+
+                except (discord.HTTPException, aiohttp.ClientError, TimeoutError):
+                    await self._mark_attempt(notification)
+                    if notification.attempts >= NOTIFICATION_MAX_ATTEMPTS:
+                        # no need to wait before giving up
+                        break
+
+                    delay = NOTIFICATION_BACKOFF * 2 ** (notification.attempts - 1)
+                    LOGGER.warning(
+                        f"Could not deliver {notification.kind.name} "
+                        f"(attempt {notification.attempts}), retrying in {delay}s."
+                    )
+                    await asyncio.sleep(delay)
+
+                else:
+                    await self._mark_delivered(notification)
+                    LOGGER.debug(
+                        f"Delivered {notification.kind.name} for "
+                        f"Giveaway {notification.giveaway_id}."
+                    )
+                    return
+
+            LOGGER.error(
+                f"Giving up on {notification.kind.name} for "
+                f"Giveaway {notification.giveaway_id}."
+            )
+
+        finally:
+            self._tasks.pop(notification.id, None)
+
+    async def _send(self, notification: Notification) -> None:
+        """Send the notification to its target."""
+        match notification.kind:
+            case NotificationKind.USER_DM:
+                user = self.bot.get_user(
+                    notification.target_id
+                ) or await self.bot.fetch_user(notification.target_id)
+                try:
+                    await user.send(notification.content)
+                except discord.Forbidden:
+                    if notification.fallback_content is None:
+                        raise
+                    # cannot send to user, sending message to bot owner
+                    LOGGER.info(
+                        f"Could not send message to {user}, sending to bot owner."
+                    )
+                    app_info = await self.bot.application_info()
+                    await app_info.owner.send(notification.fallback_content)
+
+            case NotificationKind.CHANNEL_MESSAGE:
+                channel = self.bot.get_partial_messageable(notification.target_id)
+                await channel.send(notification.content)
+
+            case NotificationKind.EDIT_MESSAGE:
+                channel = self.bot.get_partial_messageable(notification.target_id)
+                message = channel.get_partial_message(notification.message_id)  # type: ignore[not-none]
+                embed = (
+                    discord.Embed.from_dict(notification.embed)
+                    if notification.embed is not None
+                    else None
+                )
+                await message.edit(embed=embed, view=None)
+
+    async def _get_pending_notifications(self) -> list[Notification]:
+        """Return the notifications that were not delivered yet."""
+        async with self.bot.db.session() as session:
+            notifications = await session.scalars(
+                select(Notification).where(
+                    not_(Notification.delivered),
+                    Notification.attempts < NOTIFICATION_MAX_ATTEMPTS,
+                )
+            )
+
+        return list(notifications)
+
+    async def _mark_attempt(
+        self, notification: Notification, *, give_up: bool = False
+    ) -> None:
+        """Save a failed attempt to deliver the notification."""
+        notification.attempts = (
+            NOTIFICATION_MAX_ATTEMPTS if give_up else notification.attempts + 1
+        )
+        async with self.bot.db.session() as session, session.begin():
+            await session.execute(
+                update(Notification)
+                .where(
+                    Notification.id == notification.id,
+                )
+                .values(
+                    attempts=notification.attempts,
+                )
+            )
+
+    async def _mark_delivered(self, notification: Notification) -> None:
+        """Mark the notification as delivered."""
+        notification.delivered = True
+        async with self.bot.db.session() as session, session.begin():
+            await session.execute(
+                update(Notification)
+                .where(
+                    Notification.id == notification.id,
+                )
+                .values(
+                    delivered=True,
+                )
+            )
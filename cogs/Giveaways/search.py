@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+class PrefixIndex:
+    """In-memory index of strings, searchable by case-insensitive prefix.
+
+    The values are kept in a sorted list, so a search is a binary search
+    followed by a short scan, and values can be added or removed one at a time.
+    The same value can be added more than once, it is then counted.
+    """
+
+    def __init__(self, values: Iterable[str] = ()) -> None:
+        self._counts: Counter[str] = Counter(values)
+        self._sorted: list[tuple[str, str]] = sorted(
+            (value.casefold(), value) for value in self._counts
+        )
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def count(self, value: str) -> int:
+        """Return how many times the value was added."""
+        return self._counts[value]
+
+    def complete(self, value: str) -> list[str]:
+        """Return the value if it was added, else the values it starts.
+
+        Unlike search, the prefix is case-sensitive, to find the values that
+        were truncated to fit in an autocomplete choice.
+        """
+        if self._counts[value] > 0:
+            return [value]
+
+        return [match for match in self.search(value) if match.startswith(value)]
+
+    def add(self, value: str) -> None:
+        """Add one occurrence of the value."""
+        self._counts[value] += 1
+        if self._counts[value] == 1:
+            insort(self._sorted, (value.casefold(), value))
+
+    def remove(self, value: str) -> None:
+        """Remove one occurrence of the value, if it is in the index."""
+        if self._counts[value] <= 0:
+            return
+
+        self._counts[value] -= 1
+        if self._counts[value] == 0:
+            del self._counts[value]
+            item = (value.casefold(), value)
+            i = bisect_left(self._sorted, item)
+            if i < len(self._sorted) and self._sorted[i] == item:
+                del self._sorted[i]
+
+    def search(self, prefix: str, limit: int = 25) -> list[str]:
+        """Return up to limit values starting with the prefix, in order."""
+        folded = prefix.casefold()
+        results: list[str] = []
+        i = bisect_left(self._sorted, (folded, ""))
+        while i < len(self._sorted) and len(results) < limit:
+            key, value = self._sorted[i]
+            if not key.startswith(folded):
+                break
+            results.append(value)
+            i += 1
+
+        return results
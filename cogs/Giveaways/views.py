@@ -6,7 +6,6 @@ from typing import TYPE_CHECKING
 
 import discord
 from discord import ui
-from sqlalchemy.exc import IntegrityError
 
 LOGGER = logging.getLogger(__name__)
 
@@ -53,15 +52,13 @@ class GiveawayView(ui.View):
         self,
         interaction: discord.Interaction,
     ) -> None:
-        try:
-            await self.cog._add_entry(interaction.user, self.giveaway_id)
-        except IntegrityError:
-            content = "You already entered this giveaway!"
-        else:
+        if await self.cog._add_entry(interaction.user, self.giveaway_id):
             content = (
                 "You're entered and all set! "
                 "Good luck \N{HAND WITH INDEX AND MIDDLE FINGERS CROSSED}"
             )
+        else:
+            content = "You already entered this giveaway!"
 
         embed = interaction.message.embeds[0]  # type: ignore[not-none]
         entries = await self.cog._count_entries(self.giveaway_id)
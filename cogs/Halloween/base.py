@@ -30,7 +30,8 @@ if TYPE_CHECKING:
         last_names: list[str]
         emojis: list[str]
 
-    RarityLiteral = Literal["common", "uncommon", "rare"]
+
+RarityLiteral = Literal["common", "uncommon", "rare"]
 
 
 @dataclass(frozen=True)
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
 import asyncio
-import itertools
 import logging
 import random
 import tomllib
 from pathlib import Path
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
 from discord import (
     Color,
@@ -21,8 +20,10 @@ from discord.abc import GuildChannel
 from discord.ext import commands, tasks
 from sqlalchemy import desc, func, select
 from sqlalchemy.exc import IntegrityError
-from tabulate import tabulate
 
+from ..utils.database import read_session
+from ..utils.members import MemberCache
+from ..utils.rendering import RenderQueueFull, RenderService
 from .base import (
     CURSE_LENGTH,
     RARITY,
@@ -43,6 +44,7 @@ from .models import (
     Treat,
     TrickOrTreaterMessage,
 )
+from .tables import loot_table, scoreboard_table
 from .views import HalloweenStartView, TradeModal, TreatsView, TrickOrTreaterView
 
 if TYPE_CHECKING:
@@ -64,6 +66,12 @@ if TYPE_CHECKING:
 
 PATH = Path(__file__).parent
 LOGGER = logging.getLogger(__name__)
+RENDER_BUSY = "I am a bit busy right now, try again in a moment ⏳"
+
+
+def load_assets() -> dict[str, Any]:
+    with (PATH / "assets.toml").open("rb") as f:
+        return tomllib.load(f)
 
 
 def random_rarity(loot_rates: Rarity) -> Literal["common", "uncommon", "rare"]:
@@ -87,15 +95,11 @@ class Halloween(commands.Cog):
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
 
-        with (PATH / "assets.toml").open("rb") as f:
-            data = tomllib.load(f)
-            self.rarity: Rarity = data["rarity"]
-            self.blessed_rarity: Rarity = data["blessed_rarity"]
-            self.trick_or_treaters: list[TrickOrTreater] = data["trick_or_treaters"]
-            self.treats: list[BaseTreat] = [
-                BaseTreat(**treat) for treat in data["treats"]
-            ]
-            self.cursed_names: CursedNames = data["cursed_names"]
+        self.rarity: Rarity
+        self.blessed_rarity: Rarity
+        self.trick_or_treaters: list[TrickOrTreater]
+        self.treats: list[BaseTreat]
+        self.cursed_names: CursedNames
 
         self.increase_trick_or_treater_spawn_rate.start()
 
@@ -105,6 +109,15 @@ class Halloween(commands.Cog):
 
         self.halloween_start_view_added: bool = False
 
+    async def cog_load(self) -> None:
+        """Load the assets of the event, without blocking the event loop."""
+        data = await asyncio.to_thread(load_assets)
+        self.rarity = data["rarity"]
+        self.blessed_rarity = data["blessed_rarity"]
+        self.trick_or_treaters = data["trick_or_treaters"]
+        self.treats = [BaseTreat(**treat) for treat in data["treats"]]
+        self.cursed_names = data["cursed_names"]
+
     @commands.Cog.listener()
     async def on_ready(self) -> None:
         if not self.halloween_start_view_added:
@@ -221,27 +234,16 @@ class Halloween(commands.Cog):
 
         loot = await self._get_member_loot(interaction.user)
         # split the loot in sub-lists by rarity
-        loot_list = [
-            sorted(item.name for item in loot if item.rarity == rarity)
+        loot_list = tuple(
+            tuple(sorted(item.name for item in loot if item.rarity == rarity))
             for rarity in RARITY
-        ]
-
-        # tabulate needs a list of ROWS, so we zip the lists that were split by rarity
-        # and fill with empty values to have enough rows for the longest rarity list
-        table_data: list[Sequence[str]] = list(
-            itertools.zip_longest(
-                *loot_list,
-                fillvalue="",
-            )
-        )
-        # create the table. maxcolwidths and tablefmt were chosen to allow sending
-        # a full table in an embed and be under discord' length limit
-        table = tabulate(
-            table_data or loot_list,  # prevent error when there's no loot
-            headers=[rarity.title() for rarity in RARITY],
-            maxcolwidths=16,
-            tablefmt="presto",
         )
+        renderer: RenderService = self.bot.renderer  # type: ignore[attr-defined]
+        try:
+            table = await renderer.render(loot_table, loot_list)
+        except (RenderQueueFull, TimeoutError):
+            await interaction.response.send_message(RENDER_BUSY, ephemeral=True)
+            return
 
         embed = Embed(
             title="Halloween Loot Inventory",
@@ -263,7 +265,8 @@ class Halloween(commands.Cog):
             ephemeral=True,
         )
 
-    @halloween.command(name="trade")
+    # the modal is sent after loading the loot, which can take long
+    @halloween.command(name="trade", extras={"auto_defer": False})
     async def halloween_trade(self, interaction: Interaction[Bot]) -> None:
         """Trade the duplicated loot for rare loot items."""
         assert isinstance(interaction.user, Member)
@@ -352,10 +355,14 @@ class Halloween(commands.Cog):
         assert interaction.guild is not None
 
         scores = await self._get_guild_scores(interaction.guild)
+        member_cache: MemberCache = self.bot.member_cache  # type: ignore[attr-defined]
+        members = await member_cache.fetch_many(
+            interaction.guild, [user_id for user_id, _ in scores]
+        )
 
         table_data: list[tuple[int, int, str]] = []
         for rank, (user_id, amount) in enumerate(scores):
-            member = interaction.guild.get_member(user_id)
+            member = members.get(user_id)
             table_data.append(
                 (
                     rank + 1,
@@ -364,11 +371,12 @@ class Halloween(commands.Cog):
                 )
             )
 
-        table = tabulate(
-            table_data,
-            headers=["Rank", "Loots", "Member"],
-            tablefmt="presto",
-        )
+        renderer: RenderService = self.bot.renderer  # type: ignore[attr-defined]
+        try:
+            table = await renderer.render(scoreboard_table, tuple(table_data))
+        except (RenderQueueFull, TimeoutError):
+            await interaction.response.send_message(RENDER_BUSY, ephemeral=True)
+            return
 
         embed = Embed(
             title=f"Halloween Scoreboard • {interaction.guild.name}",
@@ -902,7 +910,7 @@ class Halloween(commands.Cog):
             The loot inventory.
 
         """
-        async with self.bot.db.session() as session:
+        async with read_session(self.bot) as session:
             loot = await session.scalars(
                 select(Loot).filter_by(
                     guild_id=member.guild.id,
@@ -975,7 +983,7 @@ class Halloween(commands.Cog):
             A list of (user_id, score) tuple.
 
         """
-        async with self.bot.db.session() as session, session.begin():
+        async with read_session(self.bot) as session:
             scores = await session.execute(
                 select(Loot.user_id, func.count(Loot.user_id).label("amount"))
                 .filter_by(guild_id=guild.id)
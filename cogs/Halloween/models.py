@@ -2,7 +2,7 @@ import datetime
 from enum import Enum, auto
 
 from snapcogs.database import Base
-from sqlalchemy import DateTime, UniqueConstraint
+from sqlalchemy import DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import RarityLiteral
@@ -32,6 +32,14 @@ class TrickOrTreaterMessage(HalloweenBase):
     """The message containing a trick-or-treater that a member has given a treat to."""
 
     __tablename__ = "halloween_trick_or_treater_log"
+    __table_args__ = (
+        Index(
+            "ix_halloween_trick_or_treater_log_member",
+            "guild_id",
+            "user_id",
+            "message_id",
+        ),
+    )
 
     message_id: Mapped[int]
 
@@ -40,6 +48,7 @@ class Loot(HalloweenBase):
     """The loot that a member has."""
 
     __tablename__ = "halloween_loot"
+    __table_args__ = (Index("ix_halloween_loot_member", "guild_id", "user_id", "name"),)
 
     name: Mapped[str]
     rarity: Mapped[RarityLiteral]
@@ -50,6 +59,9 @@ class Treat(HalloweenBase):
     """The number of treats a member has."""
 
     __tablename__ = "halloween_treat_count"
+    __table_args__ = (
+        Index("ix_halloween_treat_count_member", "guild_id", "user_id", "name"),
+    )
 
     name: Mapped[str]
     emoji: Mapped[str]
@@ -69,6 +81,9 @@ class EventLog(Base):
     """A record of an event that happened."""
 
     __tablename__ = "halloween_event_log"
+    __table_args__ = (
+        Index("ix_halloween_event_log_member", "guild_id", "user_id", "event"),
+    )
 
     guild_id: Mapped[int]
     user_id: Mapped[int | None]
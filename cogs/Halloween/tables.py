@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import itertools
+
+from tabulate import tabulate
+
+from .base import RARITY
+
+
+def loot_table(loot_list: tuple[tuple[str, ...], ...]) -> str:
+    """Render the loot of a member, with one column per rarity.
+
+    Parameters
+    ----------
+    loot_list : tuple[tuple[str, ...], ...]
+        The names of the loot items, for each rarity.
+
+    Returns
+    -------
+    str
+        The table.
+
+    """
+    # tabulate needs a list of ROWS, so we zip the lists that were split by rarity
+    # and fill with empty values to have enough rows for the longest rarity list
+    table_data = list(itertools.zip_longest(*loot_list, fillvalue=""))
+    # create the table. maxcolwidths and tablefmt were chosen to allow sending
+    # a full table in an embed and be under discord' length limit
+    return tabulate(
+        table_data or loot_list,  # prevent error when there's no loot
+        headers=[rarity.title() for rarity in RARITY],
+        maxcolwidths=16,
+        tablefmt="presto",
+    )
+
+
+def scoreboard_table(rows: tuple[tuple[int, int, str], ...]) -> str:
+    """Render the scoreboard of a guild.
+
+    Parameters
+    ----------
+    rows : tuple[tuple[int, int, str], ...]
+        The rank, amount of loot and name of each member.
+
+    Returns
+    -------
+    str
+        The table.
+
+    """
+    return tabulate(rows, headers=["Rank", "Loots", "Member"], tablefmt="presto")
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import random
 from enum import Enum, auto
@@ -18,9 +19,10 @@ from discord import (
 )
 from discord.ext import commands
 from snapcogs.database import Base
-from sqlalchemy import select
+from sqlalchemy import Index, select
 from sqlalchemy.orm import Mapped  # noqa: TC002
 
+from ..utils.database import read_session
 from .models import Event, EventLog, Loot, Treat
 
 if TYPE_CHECKING:
@@ -37,6 +39,12 @@ MC_CONSOLE_CHANNEL = 1420817181721104415  # Hatventures Community
 # MC_CONSOLE_CHANNEL = 588171779957063680  # Bot Testing Server
 
 
+def load_trophy_commands() -> list[str]:
+    with (PATH / "trophies.txt").open() as f:
+        # each line of the file is a Minecraft command
+        return f.readlines()
+
+
 # Maybe add milestones if the event is very popular?
 class Milestone(Enum):
     ALL_TREATS = auto()
@@ -83,6 +91,10 @@ def fmt_milestones(milestones: Mapping[Milestone, bool]) -> str:
 
 class MilestoneLog(Base):
     __tablename__ = "halloween_milestone"
+    __table_args__ = (
+        Index("ix_halloween_milestone_member", "guild_id", "user_id", "milestone"),
+    )
+
     guild_id: Mapped[int]
     user_id: Mapped[int]
     milestone: Mapped[Milestone]
@@ -113,10 +125,7 @@ class Trophies(commands.Cog):
 
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
-
-        with (PATH / "trophies.txt").open() as f:
-            # each line of the file is a Minecraft command
-            self.trophy_commands = f.readlines()
+        self.trophy_commands: list[str] = []
 
         # Add the subcommands to the /halloween command group
         self.halloween_cog: Halloween = self.bot.get_cog("Halloween")  # type: ignore[]
@@ -136,6 +145,10 @@ class Trophies(commands.Cog):
             )
         )
 
+    async def cog_load(self) -> None:
+        """Load the trophy commands, without blocking the event loop."""
+        self.trophy_commands = await asyncio.to_thread(load_trophy_commands)
+
     async def halloween_trophies(self, interaction: Interaction[Bot]) -> None:
         """Claim the trophies for the newly reached milestones."""
         assert isinstance(interaction.user, Member)
@@ -297,7 +310,7 @@ class Trophies(commands.Cog):
             Whether the milestone was reached by the member or not.
 
         """
-        async with self.bot.db.session() as session:
+        async with read_session(self.bot) as session:
             type_of_treats = await session.scalars(
                 select(Treat).filter_by(
                     guild_id=member.guild.id,
@@ -320,7 +333,7 @@ class Trophies(commands.Cog):
             Whether the milestone was reached by the member or not.
 
         """
-        async with self.bot.db.session() as session:
+        async with read_session(self.bot) as session:
             loots = await session.scalars(
                 select(Loot).filter_by(
                     guild_id=member.guild.id,
@@ -424,7 +437,7 @@ class Trophies(commands.Cog):
             Whether the milestone was reached by the member or not.
 
         """
-        async with self.bot.db.session() as session:
+        async with read_session(self.bot) as session:
             loots = await session.scalars(
                 select(Loot).filter_by(
                     guild_id=member.guild.id,
@@ -497,7 +510,7 @@ class Trophies(commands.Cog):
             Whether the milestone was reached by the member or not.
 
         """
-        async with self.bot.db.session() as session:
+        async with read_session(self.bot) as session:
             curses = await session.scalars(
                 select(EventLog).filter_by(
                     guild_id=member.guild.id,
@@ -119,6 +119,8 @@ class TreatButton(ui.Button["TrickOrTreaterView"]):
     """The button to give a treat to the trick-or-treater."""
 
     view: TrickOrTreaterView
+    # the modal is sent after loading the inventory, which can take long
+    auto_defer = False
 
     def __init__(self) -> None:
         super().__init__(label="Give a treat!", emoji="🎃", style=ButtonStyle.green)
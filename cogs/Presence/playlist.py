@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import logging
+import random
+import tomllib
+from collections import Counter
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Activity:
+    """An entry of the playlist, with how often it should come up in a cycle."""
+
+    name: str
+    weight: int = 1
+
+    def render(self, counters: Mapping[str, Any]) -> str:
+        """Return the name with the placeholders filled from the counters.
+
+        Unknown placeholders are left as is.
+        """
+        try:
+            return self.name.format_map(_Placeholders(counters))
+        except (ValueError, IndexError, AttributeError):
+            LOGGER.warning(f"Invalid placeholders in activity {self.name!r}.")
+            return self.name
+
+
+class _Placeholders(dict):
+    def __missing__(self, key: str) -> str:
+        return f"{{{key}}}"
+
+
+def parse_activities(data: dict[str, Any]) -> list[Activity]:
+    """Parse the activities from the content of the activities.toml file.
+
+    An entry is either a string, or a table with a name and a weight.
+    """
+    activities = []
+    for entry in data["activities"]:
+        if isinstance(entry, str):
+            activities.append(Activity(name=entry))
+        else:
+            activities.append(
+                Activity(name=entry["name"], weight=max(1, int(entry.get("weight", 1))))
+            )
+
+    if not activities:
+        msg = "There are no activities."
+        raise ValueError(msg)
+
+    return activities
+
+
+def shuffle_cycle(
+    activities: list[Activity],
+    *,
+    previous: Activity | None = None,
+    rng: random.Random | None = None,
+) -> list[Activity]:
+    """Return a shuffled cycle of the activities, weighted entries repeated.
+
+    The same activity does not come up twice in a row, including after the
+    previous one, unless there is no other way to order them.
+    """
+    rng = rng or random.Random()  # noqa: S311
+    remaining = Counter({activity: activity.weight for activity in activities})
+    cycle: list[Activity] = []
+    last = previous
+
+    while remaining:
+        total = remaining.total()
+        top, top_count = remaining.most_common(1)[0]
+        if top != last and 2 * top_count >= total:
+            # the most frequent activity has to come now to stay separated
+            choice = top
+        else:
+            candidates = [activity for activity in remaining if activity != last]
+            if not candidates:
+                candidates = list(remaining)
+            choice = rng.choices(
+                candidates, weights=[remaining[c] for c in candidates]
+            )[0]
+
+        cycle.append(choice)
+        remaining[choice] -= 1
+        if remaining[choice] == 0:
+            del remaining[choice]
+        last = choice
+
+    return cycle
+
+
+class Playlist:
+    """Playlist of activities, read from a TOML file.
+
+    The file is parsed again only when its modification time changes, and the
+    activities are played in a shuffled order, one full cycle at a time.
+    """
+
+    def __init__(self, path: Path, *, rng: random.Random | None = None) -> None:
+        self.path = path
+        self.rng = rng or random.Random()  # noqa: S311
+        self.activities: list[Activity] = []
+        self._mtime_ns: int | None = None
+        self._queue: list[Activity] = []
+        self._last: Activity | None = None
+
+    def refresh(self) -> bool:
+        """Parse the file again if it changed, return True if it was reloaded.
+
+        If the new content is invalid, the previous activities are kept.
+        This reads from disk, so it should be run in a thread.
+        """
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except OSError:
+            if not self.activities:
+                raise
+            # editors can replace the file, so it may be missing for a moment
+            LOGGER.warning(
+                f"Could not read {self.path.name}, keeping the previous activities."
+            )
+            return False
+
+        if mtime_ns == self._mtime_ns:
+            return False
+
+        try:
+            with self.path.open("rb") as f:
+                activities = parse_activities(tomllib.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            if not self.activities:
+                raise
+            LOGGER.exception("Invalid activities file, keeping the previous ones.")
+            self._mtime_ns = mtime_ns
+            return False
+
+        LOGGER.info(f"Loaded {len(activities)} activities from {self.path.name}.")
+        self.activities = activities
+        self._mtime_ns = mtime_ns
+        self._queue = []
+        return True
+
+    def next(self) -> Activity:
+        """Return the next activity of the playlist, starting a new cycle if needed."""
+        if not self._queue:
+            self._queue = shuffle_cycle(
+                self.activities, previous=self._last, rng=self.rng
+            )
+            # pop from the end
+            self._queue.reverse()
+
+        self._last = self._queue.pop()
+        return self._last
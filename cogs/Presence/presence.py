@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-import random
-import tomllib
+import asyncio
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import discord
 from discord.ext import commands, tasks
 
+from .playlist import Playlist
+
 if TYPE_CHECKING:
     from discord.ext.commands import Context
     from snapcogs.bot import Bot
@@ -16,17 +17,10 @@ if TYPE_CHECKING:
 PATH = Path(__file__).parent
 
 
-def load_activities() -> list[discord.CustomActivity]:
-    with (PATH / "activities.toml").open("rb") as f:
-        data = tomllib.load(f)
-
-    return [discord.CustomActivity(name=name) for name in data["activities"]]
-
-
 class Presence(commands.Cog):
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
-        self.activities = load_activities()
+        self.playlist = Playlist(PATH / "activities.toml")
         self.change_presence.start()
 
     async def cog_unload(self) -> None:
@@ -38,10 +32,28 @@ class Presence(commands.Cog):
 
     @tasks.loop(hours=1)
     async def change_presence(self) -> None:
-        """Change the Bot's presence periodically with a random activity."""
-        await self.bot.change_presence(activity=random.choice(self.activities))
+        """Change the Bot's presence periodically with the next activity.
+
+        The activities file is reloaded if it changed since the last time.
+        """
+        await asyncio.to_thread(self.playlist.refresh)
+        activity = self.playlist.next()
+        await self.bot.change_presence(
+            activity=discord.CustomActivity(name=activity.render(self.get_counters()))
+        )
 
     @change_presence.before_loop
     async def change_presence_before(self) -> None:
         """Wait until the Bot is fully loaded."""
         await self.bot.wait_until_ready()
+
+    def get_counters(self) -> dict[str, Any]:
+        """Return the values available as placeholders in the activities.
+
+        They are all taken from the Bot's cache, without calling the API.
+        """
+        return {
+            "guilds": len(self.bot.guilds),
+            "members": sum(guild.member_count or 0 for guild in self.bot.guilds),
+            "users": len(self.bot.users),
+        }
@@ -1,9 +1,17 @@
+import asyncio
+import logging
+import time
 from collections.abc import Callable
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
+LOGGER = logging.getLogger(__name__)
+
+# seconds before the owner ids are fetched again, in the background
+OWNER_IDS_TTL = 3600
+
 
 class NotOwner(app_commands.CheckFailure):
     """Exception raised when the message author is not the owner of the bot.
@@ -12,6 +20,129 @@ class NotOwner(app_commands.CheckFailure):
     """
 
 
+class RoleIndex:
+    """Index of the roles of each guild, by id and by name.
+
+    The index of a guild is built when first needed, and dropped when one of
+    its roles is created, updated or deleted, so that checks do not search
+    through guild.roles on every invocation. Call install to listen to these
+    events.
+
+    A new session (after a fresh IDENTIFY) replaces the guilds and their roles
+    without any role event, so the index is also rebuilt when the guild is not
+    the object it was built from.
+    """
+
+    def __init__(self) -> None:
+        # guild id -> (guild, roles by id, roles by name)
+        self._guilds: dict[
+            int,
+            tuple[discord.Guild, dict[int, discord.Role], dict[str, discord.Role]],
+        ] = {}
+
+    def get(self, guild: discord.Guild, item: int | str) -> discord.Role | None:
+        """Return the role with the given id, or exact name, if it exists."""
+        index = self._guilds.get(guild.id)
+        if index is None or index[0] is not guild:
+            index = self._guilds[guild.id] = (guild, *self._build(guild))
+
+        _, by_id, by_name = index
+        if isinstance(item, int):
+            return by_id.get(item)
+        return by_name.get(item)
+
+    def _build(
+        self, guild: discord.Guild
+    ) -> tuple[dict[int, discord.Role], dict[str, discord.Role]]:
+        by_id: dict[int, discord.Role] = {}
+        by_name: dict[str, discord.Role] = {}
+        for role in guild.roles:
+            by_id[role.id] = role
+            # like discord.utils.get, the lowest role wins if names are the same
+            by_name.setdefault(role.name, role)
+        return by_id, by_name
+
+    def invalidate(self, guild_id: int) -> None:
+        self._guilds.pop(guild_id, None)
+
+    async def on_guild_role_create(self, role: discord.Role) -> None:
+        self.invalidate(role.guild.id)
+
+    async def on_guild_role_update(
+        self,
+        before: discord.Role,  # noqa: ARG002
+        after: discord.Role,
+    ) -> None:
+        self.invalidate(after.guild.id)
+
+    async def on_guild_role_delete(self, role: discord.Role) -> None:
+        self.invalidate(role.guild.id)
+
+    async def on_guild_join(self, guild: discord.Guild) -> None:
+        self.invalidate(guild.id)
+
+    async def on_guild_available(self, guild: discord.Guild) -> None:
+        self.invalidate(guild.id)
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        self.invalidate(guild.id)
+
+    def install(self, bot: commands.Bot) -> None:
+        """Drop the index of a guild when its roles change, or it is replaced."""
+        bot.add_listener(self.on_guild_role_create)
+        bot.add_listener(self.on_guild_role_update)
+        bot.add_listener(self.on_guild_role_delete)
+        bot.add_listener(self.on_guild_join)
+        bot.add_listener(self.on_guild_available)
+        bot.add_listener(self.on_guild_remove)
+
+
+class OwnerIds:
+    """Ids of the owner, or of the team members, of the application.
+
+    They are fetched on the first check, then refreshed in the background once
+    they are older than the TTL, so the checks after the first one do not wait
+    for the API.
+    """
+
+    def __init__(self, ttl: float = OWNER_IDS_TTL) -> None:
+        self.ttl = ttl
+        self._ids: frozenset[int] | None = None
+        self._expires_at = 0.0
+        self._refresh_task: asyncio.Task[None] | None = None
+
+    async def get(self, client: discord.Client) -> frozenset[int]:
+        if self._ids is None or self._expires_at < time.monotonic():
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh(client))
+            if self._ids is None:
+                await asyncio.shield(self._refresh_task)
+
+        assert self._ids is not None
+        return self._ids
+
+    async def _refresh(self, client: discord.Client) -> None:
+        try:
+            app = await client.application_info()
+        except discord.HTTPException:
+            if self._ids is None:
+                raise
+            # keep the previous ids, and try again in a minute at most
+            LOGGER.warning("Could not refresh the owner ids.", exc_info=True)
+            self._expires_at = time.monotonic() + min(self.ttl, 60)
+            return
+
+        if app.team:
+            self._ids = frozenset(m.id for m in app.team.members)
+        else:
+            self._ids = frozenset({app.owner.id})
+        self._expires_at = time.monotonic() + self.ttl
+
+
+ROLE_INDEX = RoleIndex()
+OWNER_IDS = OwnerIds()
+
+
 def has_role_or_above[T](item: int | str) -> Callable[[T], T]:
     """Check the roles of the member invoking the command.
 
@@ -30,12 +161,7 @@ def has_role_or_above[T](item: int | str) -> Callable[[T], T]:
         if ctx.guild is None:
             raise commands.NoPrivateMessage
 
-        if isinstance(item, int):
-            role = discord.utils.get(ctx.guild.roles, id=item)
-
-        else:
-            role = discord.utils.get(ctx.guild.roles, name=item)
-
+        role = ROLE_INDEX.get(ctx.guild, item)
         if role is None:
             raise commands.MissingRole(item)
 
@@ -47,18 +173,13 @@ def has_role_or_above[T](item: int | str) -> Callable[[T], T]:
     return commands.check(predicate)
 
 
-async def _is_owner(interaction: discord.Interaction) -> bool:
+async def is_owner_predicate(interaction: discord.Interaction) -> bool:
     """Interaction based version of the discord.ext.commands.Bot.is_owner method."""
     if isinstance(interaction.client, commands.Bot):
+        # the owner ids are cached by the Bot after the first call
         return await interaction.client.is_owner(interaction.user)
 
-    app = await interaction.client.application_info()
-
-    if app.team:
-        ids = {m.id for m in app.team.members}
-        return interaction.user.id in ids
-
-    return interaction.user.id == app.owner.id
+    return interaction.user.id in await OWNER_IDS.get(interaction.client)
 
 
 def is_owner[T]() -> Callable[[T], T]:
@@ -69,7 +190,7 @@ def is_owner[T]() -> Callable[[T], T]:
     """
 
     async def predicate(interaction: discord.Interaction) -> bool:
-        if not await _is_owner(interaction):
+        if not await is_owner_predicate(interaction):
             msg = "You do not own this bot."
             raise NotOwner(msg)
         return True
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Collection
+
+LOGGER = logging.getLogger(__name__)
+
+
+def read_section(
+    config: dict[str, Any], section: str, names: Collection[str]
+) -> dict[str, Any]:
+    """Return the settings of a section of config.toml with the given names.
+
+    The other settings are ignored, and reported since they are likely typos.
+    """
+    settings: dict[str, Any] = config.get(section, {})
+    if unknown := settings.keys() - set(names):
+        LOGGER.warning(f"Unknown {section} settings: {', '.join(sorted(unknown))}.")
+
+    return {name: value for name, value in settings.items() if name in names}
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .config import read_section
+
+if TYPE_CHECKING:
+    from snapcogs.bot import Bot
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DatabaseProfile:
+    """Settings applied to every new connection to the SQLite database.
+
+    The defaults let readers work while a writer is active (WAL), and make
+    writers wait for the lock instead of failing right away.
+    They can be changed in the [database] section of config.toml.
+    """
+
+    journal_mode: str = "wal"
+    synchronous: str = "normal"
+    # milliseconds
+    busy_timeout: int = 5000
+    # bytes
+    mmap_size: int = 256 * 1024 * 1024
+    # negative values are in KiB, positive values in pages
+    cache_size: int = -16 * 1024
+    temp_store: str = "memory"
+    # hours between each PRAGMA optimize, 0 to disable
+    optimize_interval: float = 6
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> DatabaseProfile:
+        """Create the profile from the [database] section of the config."""
+        names = {field.name for field in fields(cls)}
+        return cls(**read_section(config, "database", names))
+
+    def pragmas(self) -> list[str]:
+        """Return the PRAGMA statements to run on each new connection.
+
+        The journal mode is not included, it is persistent and set only once.
+        """
+        return [
+            f"PRAGMA synchronous = {self.synchronous}",
+            f"PRAGMA busy_timeout = {int(self.busy_timeout)}",
+            f"PRAGMA mmap_size = {int(self.mmap_size)}",
+            f"PRAGMA cache_size = {int(self.cache_size)}",
+            f"PRAGMA temp_store = {self.temp_store}",
+        ]
+
+
+def get_engine(bot: Bot) -> AsyncEngine:
+    """Return the engine of the bot's database, the bind of its sessionmaker."""
+    return bot.db.session.kw["bind"]
+
+
+def create_read_only_engine(db_path: str) -> AsyncEngine:
+    """Create an engine with its own pool, that opens the database read-only."""
+    return create_async_engine(f"sqlite+aiosqlite:///file:{db_path}?mode=ro&uri=true")
+
+
+def read_session(bot: Bot) -> AsyncSession:
+    """Return a new session for queries that only read from the database.
+
+    It uses the read-only connections of the bot if it has them, so reads are
+    not queued behind the writes. Otherwise it is a regular session.
+    """
+    factory: async_sessionmaker[AsyncSession] | None = getattr(
+        bot, "db_read_session", None
+    )
+    if factory is None:
+        return bot.db.session()
+
+    return factory()
+
+
+async def tune_engine(
+    engine: AsyncEngine, profile: DatabaseProfile, *, read_only: bool = False
+) -> None:
+    """Apply the profile to the engine's connections.
+
+    The pool is emptied so that the connections opened before are replaced by
+    tuned ones. The journal mode cannot be changed by a read-only engine.
+    """
+    pragmas = profile.pragmas()
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(
+        dbapi_connection: Any,  # noqa: ANN401
+        connection_record: Any,  # noqa: ANN401, ARG001
+    ) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    await engine.dispose()
+    if read_only:
+        LOGGER.info("Tuned the read-only database connections.")
+        return
+
+    async with engine.connect() as connection:
+        journal_mode = await connection.scalar(
+            text(f"PRAGMA journal_mode = {profile.journal_mode}")
+        )
+
+    if journal_mode != profile.journal_mode.lower():
+        # in-memory databases cannot use WAL, for example
+        LOGGER.warning(
+            f"Could not set the journal mode to {profile.journal_mode}, "
+            f"using {journal_mode}."
+        )
+    LOGGER.info(f"Tuned the database connections (journal_mode={journal_mode}).")
+
+
+async def optimize(engine: AsyncEngine) -> None:
+    """Let SQLite update the statistics used by the query planner, if needed."""
+    async with engine.connect() as connection:
+        await connection.execute(text("PRAGMA optimize"))
+    LOGGER.debug("Optimized the database.")
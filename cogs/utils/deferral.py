@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+from typing import TYPE_CHECKING, Any
+
+import discord
+from discord import InteractionResponse, InteractionType, ui
+
+from .config import read_section
+from .metrics import AUTO_DEFERRALS
+
+if TYPE_CHECKING:
+    from discord.ext import commands
+
+LOGGER = logging.getLogger(__name__)
+
+# seconds after the creation of an interaction, Discord's deadline is 3 seconds
+AUTO_DEFER_AFTER = 2.0
+
+# key of the deferral task in Interaction.extras
+_DEFERRAL = "auto_deferral"
+
+# key set in Interaction.extras once the handler started to respond itself
+_RESPONDING = "auto_deferral_skipped"
+
+# key of the visibility of the "thinking" state in Interaction.extras
+_THINKING_EPHEMERAL = "auto_deferral_ephemeral"
+
+# "Interaction has already been acknowledged", when a response was in flight
+ALREADY_ACKNOWLEDGED = 40060
+
+_installed = False
+
+
+class AutoDefer:
+    """Defer the interactions that are not responded to soon enough.
+
+    Once deferred, the interaction's later send_message and edit_message calls
+    are sent as followups, or as edits of the original response, so handlers do
+    not need to know if they were deferred. They then return None.
+
+    Component interactions, and modals sent from a component, are deferred
+    without a visible "thinking" state. Application commands, and modals sent
+    from a command, show it, ephemeral by default. A command can change this
+    with extras={"defer_ephemeral": False}. The first followup would take the
+    visibility of the "thinking" state, so if the handler asks for another one,
+    the "thinking" state is deleted and a new message is sent instead.
+
+    Modals cannot be sent after deferring, so the handlers that may send one
+    late must opt out of the automatic deferral: commands with
+    extras={"auto_defer": False}, and components with a class attribute
+    auto_defer = False.
+    """
+
+    def __init__(
+        self, *, after: float = AUTO_DEFER_AFTER, ephemeral: bool = True
+    ) -> None:
+        self.after = after
+        self.ephemeral = ephemeral
+        self._tasks: set[asyncio.Task[bool]] = set()
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> AutoDefer:
+        """Create it from the [interactions] section of the config."""
+        names = {"auto_defer_after", "defer_ephemeral"}
+        settings = read_section(config, "interactions", names)
+        return cls(
+            after=settings.get("auto_defer_after", AUTO_DEFER_AFTER),
+            ephemeral=settings.get("defer_ephemeral", True),
+        )
+
+    def install(self, bot: commands.Bot) -> None:
+        """Watch the interactions of the bot, if the automatic deferral is enabled."""
+        if self.after <= 0:
+            return
+
+        _wrap_responses()
+        bot.add_listener(self.on_interaction)
+
+    async def on_interaction(self, interaction: discord.Interaction) -> None:
+        if interaction.type not in {
+            InteractionType.application_command,
+            InteractionType.component,
+            InteractionType.modal_submit,
+        }:
+            return
+
+        age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        delay = min(max(self.after - age, 0), self.after)
+        asyncio.get_running_loop().call_later(delay, self._on_deadline, interaction)
+
+    def _on_deadline(self, interaction: discord.Interaction) -> None:
+        if (
+            interaction.response.is_done()
+            or interaction.extras.get(_RESPONDING)
+            or not self._enabled_for(interaction)
+        ):
+            return
+
+        task = asyncio.create_task(self._defer(interaction))
+        # the response methods wait for the deferral, to not respond twice
+        interaction.extras[_DEFERRAL] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _enabled_for(self, interaction: discord.Interaction) -> bool:
+        extras = getattr(interaction.command, "extras", {})
+        return interaction.extras.get("auto_defer", extras.get("auto_defer", True))
+
+    async def _defer(self, interaction: discord.Interaction) -> bool:
+        """Defer the interaction, and return whether it was deferred."""
+        thinking = interaction.message is None
+        extras = getattr(interaction.command, "extras", {})
+        ephemeral = extras.get("defer_ephemeral", self.ephemeral)
+        name = _interaction_name(interaction)
+
+        try:
+            await _defer(interaction.response, thinking=thinking, ephemeral=ephemeral)
+        except discord.InteractionResponded:
+            return False
+        except discord.HTTPException as e:
+            if e.code == ALREADY_ACKNOWLEDGED:
+                LOGGER.debug(f"Did not defer {name}, it was responded to meanwhile.")
+            else:
+                LOGGER.exception(f"Could not defer {name}.")
+            return False
+
+        if thinking:
+            interaction.extras[_THINKING_EPHEMERAL] = ephemeral
+        AUTO_DEFERRALS.inc(type=interaction.type.name, name=name)
+        LOGGER.info(f"Deferred {name}, it was not responded to in {self.after} s.")
+        return True
+
+
+def _interaction_name(interaction: discord.Interaction) -> str:
+    if interaction.command is not None:
+        return f"/{interaction.command.qualified_name}"
+    return interaction.type.name
+
+
+async def _is_auto_deferred(interaction: discord.Interaction) -> bool:
+    """Return whether the interaction was deferred automatically.
+
+    If the deferral started, wait for it. Otherwise, prevent it, since the
+    handler is about to respond.
+    """
+    task: asyncio.Task[bool] | None = interaction.extras.get(_DEFERRAL)
+    if task is None:
+        interaction.extras[_RESPONDING] = True
+        return False
+    return await asyncio.shield(task)
+
+
+_defer = InteractionResponse.defer
+_send_message = InteractionResponse.send_message
+_edit_message = InteractionResponse.edit_message
+_send_modal = InteractionResponse.send_modal
+
+
+async def _auto_defer(
+    self: InteractionResponse,
+    **kwargs: Any,  # noqa: ANN401
+) -> Any:  # noqa: ANN401
+    """Do nothing if the interaction was deferred automatically."""
+    if await _is_auto_deferred(self._parent):
+        return None
+    return await _defer(self, **kwargs)
+
+
+async def _auto_send_message(
+    self: InteractionResponse,
+    content: Any | None = None,  # noqa: ANN401
+    **kwargs: Any,  # noqa: ANN401
+) -> Any:  # noqa: ANN401
+    """Send a followup instead if the interaction was deferred automatically."""
+    interaction = self._parent
+    if not await _is_auto_deferred(interaction):
+        return await _send_message(self, content, **kwargs)
+
+    ephemeral = kwargs.get("ephemeral", False)
+    thinking_ephemeral = interaction.extras.pop(_THINKING_EPHEMERAL, ephemeral)
+    if ephemeral != thinking_ephemeral:
+        name = _interaction_name(interaction)
+        LOGGER.warning(
+            f"The response of {name} has ephemeral={ephemeral}, but it was "
+            f"deferred with ephemeral={thinking_ephemeral}. Replacing the thinking "
+            f'state, set extras={{"defer_ephemeral": {ephemeral}}} on the command.'
+        )
+        try:
+            await interaction.delete_original_response()
+        except discord.HTTPException:
+            LOGGER.exception(
+                f"Could not delete the thinking state of {name}, the response "
+                "will have its visibility."
+            )
+
+    delete_after = kwargs.pop("delete_after", None)
+    message = await interaction.followup.send(content, wait=True, **kwargs)
+    if delete_after is not None:
+        await message.delete(delay=delete_after)
+    return None
+
+
+async def _auto_edit_message(
+    self: InteractionResponse,
+    **kwargs: Any,  # noqa: ANN401
+) -> Any:  # noqa: ANN401
+    """Edit the original response instead if the interaction was deferred."""
+    if not await _is_auto_deferred(self._parent):
+        return await _edit_message(self, **kwargs)
+
+    delete_after = kwargs.pop("delete_after", None)
+    kwargs.pop("suppress_embeds", None)
+    message = await self._parent.edit_original_response(**kwargs)
+    if delete_after is not None:
+        await message.delete(delay=delete_after)
+    return None
+
+
+async def _auto_send_modal(
+    self: InteractionResponse,
+    modal: ui.Modal,
+) -> Any:  # noqa: ANN401
+    """Explain why the modal cannot be sent if the interaction was deferred."""
+    if await _is_auto_deferred(self._parent):
+        name = _interaction_name(self._parent)
+        LOGGER.error(
+            f"Could not send {type(modal).__name__} for {name}, it was deferred "
+            "automatically. Opt it out of the automatic deferral."
+        )
+        raise discord.InteractionResponded(self._parent)
+    return await _send_modal(self, modal)
+
+
+def _wrap_responses() -> None:
+    global _installed  # noqa: PLW0603
+    if _installed:
+        return
+    _installed = True
+
+    view_task = ui.view.BaseView._scheduled_task
+
+    @functools.wraps(view_task)
+    async def _view_task(
+        self: ui.View, item: ui.Item, interaction: discord.Interaction
+    ) -> None:
+        # the components' equivalent of the commands' extras
+        if not getattr(item, "auto_defer", True):
+            interaction.extras.setdefault("auto_defer", False)
+        await view_task(self, item, interaction)
+
+    ui.view.BaseView._scheduled_task = _view_task  # type: ignore[method-assign]
+    InteractionResponse.defer = _auto_defer  # type: ignore[method-assign]
+    InteractionResponse.send_message = _auto_send_message  # type: ignore[method-assign]
+    InteractionResponse.edit_message = _auto_edit_message  # type: ignore[method-assign]
+    InteractionResponse.send_modal = _auto_send_modal  # type: ignore[method-assign]
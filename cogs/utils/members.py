@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Any
+
+import discord
+
+from .config import read_section
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+LOGGER = logging.getLogger(__name__)
+
+# most user ids accepted by a single request of guild members
+QUERY_MEMBERS_LIMIT = 100
+
+
+@dataclass(frozen=True)
+class MemberCacheSettings:
+    """How the members of the guilds are cached.
+
+    In "full" mode, discord.py downloads every guild's members at startup and
+    keeps them. In "lazy" mode, it keeps none, and members are fetched when
+    needed and kept in a MemberCache of max_size members, for ttl seconds.
+    "lazy" only suits extensions that read the members through a MemberCache.
+    They can be changed in the [members] section of config.toml.
+    """
+
+    mode: str = "full"
+    max_size: int = 1000
+    ttl: float = 600
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> MemberCacheSettings:
+        """Create the settings from the [members] section of the config."""
+        names = {field.name for field in fields(cls)}
+        return cls(**read_section(config, "members", names))
+
+    def client_options(self) -> dict[str, Any]:
+        """Return the options of the discord.py client for this mode."""
+        if self.mode == "full":
+            return {}
+        if self.mode == "lazy":
+            return {
+                "chunk_guilds_at_startup": False,
+                "member_cache_flags": discord.MemberCacheFlags.none(),
+            }
+
+        msg = f"Unknown member cache mode {self.mode!r}, use 'full' or 'lazy'."
+        raise ValueError(msg)
+
+
+class MemberCache:
+    """A bounded cache of guild members, whose entries expire.
+
+    The members cached by discord.py are used first, so it works in both modes.
+    Once discord.py has all the members of a guild, as in "full" mode, the
+    members it does not have left the guild, so they are not fetched.
+    """
+
+    def __init__(self, settings: MemberCacheSettings | None = None) -> None:
+        self.settings = settings or MemberCacheSettings()
+        # (guild id, user id) -> (expiry time, member)
+        self._members: OrderedDict[tuple[int, int], tuple[float, discord.Member]] = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def get(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        """Return the member if it is cached, without calling the API."""
+        if (member := guild.get_member(user_id)) is not None:
+            return member
+
+        key = (guild.id, user_id)
+        if (entry := self._members.get(key)) is None:
+            return None
+
+        expires_at, member = entry
+        if expires_at < time.monotonic():
+            del self._members[key]
+            return None
+
+        self._members.move_to_end(key)
+        return member
+
+    def put(self, member: discord.Member) -> None:
+        key = (member.guild.id, member.id)
+        self._members[key] = (time.monotonic() + self.settings.ttl, member)
+        self._members.move_to_end(key)
+        while len(self._members) > self.settings.max_size:
+            self._members.popitem(last=False)
+
+    async def fetch(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        """Return the member from the cache or the API, or None if it left."""
+        if (member := self.get(guild, user_id)) is not None or guild.chunked:
+            return member
+
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+
+        self.put(member)
+        return member
+
+    async def fetch_many(
+        self, guild: discord.Guild, user_ids: Iterable[int]
+    ) -> dict[int, discord.Member]:
+        """Return the members by id, fetching the ones not cached in batches.
+
+        Members who left the guild are not included.
+        """
+        members: dict[int, discord.Member] = {}
+        missing: list[int] = []
+        for user_id in dict.fromkeys(user_ids):
+            if (member := self.get(guild, user_id)) is not None:
+                members[user_id] = member
+            else:
+                missing.append(user_id)
+
+        if guild.chunked:
+            return members
+
+        for i in range(0, len(missing), QUERY_MEMBERS_LIMIT):
+            batch = missing[i : i + QUERY_MEMBERS_LIMIT]
+            try:
+                fetched = await guild.query_members(
+                    user_ids=batch, limit=QUERY_MEMBERS_LIMIT, cache=False
+                )
+            except TimeoutError:
+                LOGGER.warning(f"Timed out fetching {len(batch)} members of {guild}.")
+                continue
+
+            for member in fetched:
+                self.put(member)
+                members[member.id] = member
+
+        if missing:
+            LOGGER.debug(f"Fetched {len(missing)} uncached members of {guild}.")
+        return members
+
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent) -> None:
+        self._members.pop((payload.guild_id, payload.user.id), None)
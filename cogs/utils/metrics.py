@@ -0,0 +1,411 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+import discord
+from aiohttp import web
+from discord.ext import tasks
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import read_section
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from datetime import datetime
+    from types import SimpleNamespace
+
+    from discord.ext import commands
+
+    from .tracing import Trace, Tracer
+
+LOGGER = logging.getLogger(__name__)
+
+# seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+type Labels = tuple[str, ...]
+
+# the first part of the path of Discord's API, like "channels" or "interactions"
+_RESOURCE_RE = re.compile(r"^/api/v\d+/([^/]+)")
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric(ABC):
+    """A named value, with one series for each combination of labels."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+
+    def _key(self, labels: dict[str, str]) -> Labels:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> list[str]:
+        """Return the lines of the series, in the Prometheus text format."""
+
+    def render(self) -> str:
+        header = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        return "\n".join(header + self.samples())
+
+
+class Counter(Metric):
+    """A value that only goes up, like a number of requests."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, labels: Labels = ()) -> None:
+        super().__init__(name, description, labels)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    """A value that goes up and down, read from a function when it is collected."""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Labels,
+        collect: Callable[[], dict[Labels, float]],
+    ) -> None:
+        super().__init__(name, description, labels)
+        self.collect = collect
+
+    def samples(self) -> list[str]:
+        try:
+            values = self.collect()
+        except Exception:
+            LOGGER.exception(f"Could not collect the metric {self.name}.")
+            return []
+
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    """The distribution of observed values, like durations, in buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        # count of each bucket, not cumulative, the last one is +Inf
+        self._counts: dict[Labels, list[int]] = {}
+        self._sums: dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        if key not in self._counts:
+            self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0
+        self._counts[key][bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts, strict=True):
+                cumulative += count
+                le = bound if isinstance(bound, str) else _format_value(bound)
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels(self.labels, key, f'le="{le}"')} {cumulative}"
+                )
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The metrics of the process, rendered in Prometheus' text format."""
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+
+    def register[M: Metric](self, metric: M) -> M:
+        if metric.name in self.metrics:
+            msg = f"A metric named {metric.name} is already registered."
+            raise ValueError(msg)
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_DURATION = REGISTRY.register(
+    Histogram(
+        "hatbot_handler_duration_seconds",
+        "Time taken by application commands, components, modals and listeners.",
+        ("kind", "name"),
+    )
+)
+DB_STATEMENT_DURATION = REGISTRY.register(
+    Histogram(
+        "hatbot_db_statement_duration_seconds",
+        "Time taken by the database statements, by type of statement.",
+        ("operation",),
+        DB_BUCKETS,
+    )
+)
+DISCORD_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "hatbot_discord_request_duration_seconds",
+        "Time taken by each request to Discord's API.",
+        ("method", "resource"),
+    )
+)
+DISCORD_RESPONSES = REGISTRY.register(
+    Counter(
+        "hatbot_discord_responses_total",
+        "Responses of Discord's API, by status. 429 means rate limited.",
+        ("method", "resource", "status"),
+    )
+)
+AUTO_DEFERRALS = REGISTRY.register(
+    Counter(
+        "hatbot_auto_deferrals_total",
+        "Interactions deferred because they were not responded to in time.",
+        ("type", "name"),
+    )
+)
+RENDER_QUEUE_WAIT = REGISTRY.register(
+    Histogram(
+        "hatbot_render_queue_wait_seconds",
+        "Time the rendering jobs waited for a worker.",
+        ("job",),
+    )
+)
+RENDER_DURATION = REGISTRY.register(
+    Histogram(
+        "hatbot_render_duration_seconds",
+        "Time taken by the rendering jobs, once started by a worker.",
+        ("job",),
+    )
+)
+TASK_LAG = REGISTRY.register(
+    Histogram(
+        "hatbot_task_lag_seconds",
+        "Delay between the scheduled and actual start of the tasks' iterations.",
+        ("task",),
+    )
+)
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    """Settings of the metrics endpoint, off by default.
+
+    They can be changed in the [metrics] section of config.toml.
+    """
+
+    enabled: bool = False
+    host: str = "127.0.0.1"
+    port: int = 9108
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> MetricsConfig:
+        """Create the settings from the [metrics] section of the config."""
+        names = {field.name for field in fields(cls)}
+        return cls(**read_section(config, "metrics", names))
+
+
+class MetricsServer:
+    """Serve the metrics of the registry on /metrics."""
+
+    def __init__(self, registry: Registry, host: str, port: int) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        LOGGER.info(f"Serving metrics on http://{self.host}:{self.port}/metrics.")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(
+        self,
+        request: web.Request,  # noqa: ARG002
+    ) -> web.Response:
+        return web.Response(
+            text=self.registry.render(), content_type="text/plain", charset="utf-8"
+        )
+
+
+def instrument(tracer: Tracer, bot: commands.Bot) -> aiohttp.TraceConfig:
+    """Record the metrics of the bot, and of the database and tasks of the process.
+
+    The handlers are timed with the traces of the tracer, so the dispatch of
+    the interactions and listeners is only hooked once. The returned trace
+    config must be given to the bot, as http_trace, to time the requests.
+    """
+    tracer.observers.append(_observe_trace)
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    sleep_until = tasks.Loop._try_sleep_until
+
+    async def _try_sleep_until(self: tasks.Loop, dt: datetime) -> None:
+        await sleep_until(self, dt)
+        lag = (discord.utils.utcnow() - dt).total_seconds()
+        TASK_LAG.observe(max(lag, 0), task=self.coro.__qualname__)
+
+    tasks.Loop._try_sleep_until = _try_sleep_until  # type: ignore[method-assign]
+
+    REGISTRY.register(
+        Gauge(
+            "hatbot_queue_depth",
+            "Items waiting in the queues of the cogs.",
+            ("cog", "queue"),
+            lambda: _collect_queue_depths(bot),
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            "hatbot_asyncio_tasks",
+            "Tasks of the event loop that are not done.",
+            (),
+            lambda: {(): len(asyncio.all_tasks())},
+        )
+    )
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    return trace_config
+
+
+def _observe_trace(trace: Trace) -> None:
+    HANDLER_DURATION.observe(trace.duration, kind=trace.kind, name=trace.name)
+
+
+def _collect_queue_depths(bot: commands.Bot) -> dict[Labels, float]:
+    """Collect the depths returned by the queue_depths method of the cogs.
+
+    The jobs of the rendering service of the bot are included.
+    """
+    depths = {}
+    if (renderer := getattr(bot, "renderer", None)) is not None:
+        depths["RenderService", "jobs"] = len(renderer)
+    for cog_name, cog in bot.cogs.items():
+        if (queue_depths := getattr(cog, "queue_depths", None)) is not None:
+            for queue, depth in queue_depths().items():
+                depths[cog_name, queue] = depth
+    return depths
+
+
+def _before_cursor_execute(
+    conn: Any,  # noqa: ANN401, ARG001
+    cursor: Any,  # noqa: ANN401, ARG001
+    statement: str,  # noqa: ARG001
+    parameters: Any,  # noqa: ANN401, ARG001
+    context: Any,  # noqa: ANN401
+    executemany: bool,  # noqa: ARG001, FBT001
+) -> None:
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn: Any,  # noqa: ANN401, ARG001
+    cursor: Any,  # noqa: ANN401, ARG001
+    statement: str,
+    parameters: Any,  # noqa: ANN401, ARG001
+    context: Any,  # noqa: ANN401
+    executemany: bool,  # noqa: ARG001, FBT001
+) -> None:
+    start = getattr(context, "_metrics_start", None)
+    if start is not None:
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        DB_STATEMENT_DURATION.observe(time.perf_counter() - start, operation=operation)
+
+
+async def _on_request_start(
+    session: aiohttp.ClientSession,  # noqa: ARG001
+    context: SimpleNamespace,
+    params: aiohttp.TraceRequestStartParams,  # noqa: ARG001
+) -> None:
+    context.start = time.perf_counter()
+
+
+async def _on_request_end(
+    session: aiohttp.ClientSession,  # noqa: ARG001
+    context: SimpleNamespace,
+    params: aiohttp.TraceRequestEndParams,
+) -> None:
+    match = _RESOURCE_RE.match(params.url.path)
+    resource = match[1] if match else "other"
+    DISCORD_REQUEST_DURATION.observe(
+        time.perf_counter() - context.start, method=params.method, resource=resource
+    )
+    DISCORD_RESPONSES.inc(
+        method=params.method, resource=resource, status=str(params.response.status)
+    )
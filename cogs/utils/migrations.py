@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from sqlalchemy import text
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+LOGGER = logging.getLogger(__name__)
+
+VERSION_TABLE = "schema_version"
+
+
+@dataclass(frozen=True)
+class Step:
+    """A statement of a migration, that changes an existing table."""
+
+    table: str
+    statement: str
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A change to the schema of existing databases, applied only once.
+
+    Steps on tables that do not exist yet are skipped, since the tables are
+    created from the models with the latest schema. The models must then
+    declare the same changes.
+    """
+
+    version: int
+    description: str
+    steps: tuple[Step, ...]
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        version=1,
+        description="Add indexes for the lookups by member and by giveaway",
+        steps=(
+            Step(
+                "halloween_treat_count",
+                "CREATE INDEX IF NOT EXISTS ix_halloween_treat_count_member "
+                "ON halloween_treat_count (guild_id, user_id, name)",
+            ),
+            Step(
+                "halloween_loot",
+                "CREATE INDEX IF NOT EXISTS ix_halloween_loot_member "
+                "ON halloween_loot (guild_id, user_id, name)",
+            ),
+            Step(
+                "halloween_event_log",
+                "CREATE INDEX IF NOT EXISTS ix_halloween_event_log_member "
+                "ON halloween_event_log (guild_id, user_id, event)",
+            ),
+            Step(
+                "halloween_trick_or_treater_log",
+                "CREATE INDEX IF NOT EXISTS ix_halloween_trick_or_treater_log_member "
+                "ON halloween_trick_or_treater_log (guild_id, user_id, message_id)",
+            ),
+            Step(
+                "halloween_milestone",
+                "CREATE INDEX IF NOT EXISTS ix_halloween_milestone_member "
+                "ON halloween_milestone (guild_id, user_id, milestone)",
+            ),
+            Step(
+                "giveaways_entry",
+                "CREATE INDEX IF NOT EXISTS ix_giveaways_entry_giveaway_id_id "
+                "ON giveaways_entry (giveaway_id, id)",
+            ),
+            Step(
+                "giveaways_game",
+                "CREATE INDEX IF NOT EXISTS ix_giveaways_game_given_id "
+                "ON giveaways_game (given, id)",
+            ),
+            Step(
+                "giveaways_game",
+                "CREATE INDEX IF NOT EXISTS ix_giveaways_game_given_title "
+                "ON giveaways_game (given, title)",
+            ),
+        ),
+    ),
+    Migration(
+        version=2,
+        description="Add an index for the components of the giveaway views",
+        steps=(
+            Step(
+                "giveaways_component",
+                "CREATE INDEX IF NOT EXISTS ix_giveaways_component_view_id "
+                "ON giveaways_component (view_id)",
+            ),
+        ),
+    ),
+    Migration(
+        version=3,
+        description="Drop the index of the games on (given, id)",
+        steps=(
+            Step(
+                "giveaways_game",
+                "DROP INDEX IF EXISTS ix_giveaways_game_given_id",
+            ),
+        ),
+    ),
+)
+
+
+async def run_migrations(
+    engine: AsyncEngine, migrations: tuple[Migration, ...] = MIGRATIONS
+) -> None:
+    """Apply the migrations that were not applied to the database yet.
+
+    Each migration runs in its own transaction, with the record of its version.
+    """
+    async with engine.begin() as connection:
+        await connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+                "version INTEGER PRIMARY KEY, "
+                "description TEXT NOT NULL, "
+                "applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+            )
+        )
+        current = await connection.scalar(
+            text(f"SELECT max(version) FROM {VERSION_TABLE}")
+        )
+
+    current = current or 0
+    pending = [m for m in migrations if m.version > current]
+    if not pending:
+        LOGGER.debug(f"Database schema is up to date (version {current}).")
+        return
+
+    for migration in sorted(pending, key=lambda m: m.version):
+        async with engine.begin() as connection:
+            tables = await _get_tables(connection)
+            for step in migration.steps:
+                if step.table not in tables:
+                    LOGGER.debug(f"Table {step.table} does not exist, skipping.")
+                    continue
+                await connection.execute(text(step.statement))
+
+            await connection.execute(
+                text(
+                    f"INSERT INTO {VERSION_TABLE} (version, description) "
+                    "VALUES (:version, :description)"
+                ),
+                {"version": migration.version, "description": migration.description},
+            )
+
+        LOGGER.info(
+            f"Migrated the database to version {migration.version}: "
+            f"{migration.description}."
+        )
+
+
+async def _get_tables(connection: AsyncConnection) -> set[str]:
+    tables = await connection.scalars(
+        text("SELECT name FROM sqlite_master WHERE type = 'table'")
+    )
+    return set(tables)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Any
+
+from .config import read_section
+from .metrics import RENDER_DURATION, RENDER_QUEUE_WAIT
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RenderQueueFull(Exception):  # noqa: N818
+    """Exception raised when too many rendering jobs are already waiting."""
+
+
+@dataclass(frozen=True)
+class RenderSettings:
+    """Settings of the rendering service.
+
+    They can be changed in the [rendering] section of config.toml.
+    """
+
+    # "thread" or "process", processes do not share the GIL with the bot,
+    # but the functions and their arguments must be picklable
+    executor: str = "thread"
+    workers: int = 2
+    # jobs submitted but not finished, above which new jobs are rejected
+    max_pending: int = 32
+    # seconds
+    timeout: float = 5
+    # results kept, 0 to disable the cache
+    cache_size: int = 128
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> RenderSettings:
+        """Create the settings from the [rendering] section of the config."""
+        names = {field.name for field in fields(cls)}
+        return cls(**read_section(config, "rendering", names))
+
+
+def _run_job[T](
+    func: Callable[..., T], args: tuple, kwargs: dict[str, Any], submitted_at: float
+) -> tuple[T, float, float]:
+    """Run the job in a worker, and return its result, queue wait and duration.
+
+    time.monotonic is system-wide, so it can be compared between processes.
+    """
+    started_at = time.monotonic()
+    result = func(*args, **kwargs)
+    return result, started_at - submitted_at, time.monotonic() - started_at
+
+
+class RenderService:
+    """Run CPU-heavy rendering, like tables or images, outside the event loop.
+
+    Jobs are run in a pool of threads or processes. The results of jobs with
+    hashable arguments are cached, and identical jobs submitted at the same
+    time share the same result.
+    """
+
+    def __init__(self, settings: RenderSettings | None = None) -> None:
+        self.settings = settings or RenderSettings()
+        self._executor: Executor = (
+            ProcessPoolExecutor(self.settings.workers)
+            if self.settings.executor == "process"
+            else ThreadPoolExecutor(self.settings.workers, thread_name_prefix="render")
+        )
+        self._pending = 0
+        self._cache: OrderedDict[Hashable, asyncio.Future[Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return self._pending
+
+    async def render[T](
+        self,
+        func: Callable[..., T],
+        /,
+        *args: Any,  # noqa: ANN401
+        **kwargs: Any,  # noqa: ANN401
+    ) -> T:
+        """Run func(*args, **kwargs) in the pool and return its result.
+
+        Raise RenderQueueFull if too many jobs are waiting, and TimeoutError
+        if the job did not finish in time.
+        """
+        key = self._cache_key(func, args, kwargs)
+        if key is not None and key in self._cache:
+            self._cache.move_to_end(key)
+            return await asyncio.shield(self._cache[key])
+
+        if self._pending >= self.settings.max_pending:
+            msg = f"{self._pending} rendering jobs are already waiting."
+            raise RenderQueueFull(msg)
+
+        name = getattr(func, "__qualname__", repr(func))
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(_run_job, func, args, kwargs, time.monotonic())
+        self._pending += 1
+        # a job that timed out still uses a worker until it is done
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._job_done))
+
+        result_future = asyncio.ensure_future(self._wait(name, future))
+        if key is not None:
+            self._cache[key] = result_future
+            if len(self._cache) > self.settings.cache_size:
+                self._cache.popitem(last=False)
+            result_future.add_done_callback(lambda f: self._forget_failed(key, f))
+
+        return await asyncio.shield(result_future)
+
+    async def _wait[T](self, name: str, future: Future[tuple[T, float, float]]) -> T:
+        try:
+            result, queue_wait, duration = await asyncio.wait_for(
+                asyncio.wrap_future(future), self.settings.timeout
+            )
+        except TimeoutError:
+            # only cancelled if it is still waiting for a worker
+            future.cancel()
+            LOGGER.warning(f"Rendering {name} timed out.")
+            raise
+
+        RENDER_QUEUE_WAIT.observe(queue_wait, job=name)
+        RENDER_DURATION.observe(duration, job=name)
+        LOGGER.debug(
+            f"Rendered {name} in {duration * 1000:.1f} ms "
+            f"(waited {queue_wait * 1000:.1f} ms)."
+        )
+        return result
+
+    def _job_done(self) -> None:
+        self._pending -= 1
+
+    def _forget_failed(self, key: Hashable, future: asyncio.Future[Any]) -> None:
+        failed = future.cancelled() or future.exception() is not None
+        if failed and self._cache.get(key) is future:
+            del self._cache[key]
+
+    def _cache_key(
+        self, func: Callable[..., Any], args: tuple, kwargs: dict[str, Any]
+    ) -> Hashable | None:
+        if self.settings.cache_size <= 0:
+            return None
+
+        key = (func, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def close(self) -> None:
+        """Stop the workers, without waiting for the running jobs."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
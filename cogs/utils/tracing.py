@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+import logging
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any
+
+import discord
+from discord import app_commands, ui
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .config import read_section
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+LOGGER = logging.getLogger(__name__)
+
+# Number of traces kept in memory
+TRACES_KEPT = 50
+
+# Budgets per interaction or listener, above which a warning is logged
+MAX_STATEMENTS = 25
+MAX_DB_TIME = 0.5  # seconds
+MAX_REPEATS = 5
+
+_installed = False
+
+CURRENT_TRACE: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+# parameters lists, like "IN (?, ?, ?)", have the same shape whatever their length
+_PARAMETERS_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Return the statement with its whitespace and parameter lists normalized."""
+    statement = _WHITESPACE_RE.sub(" ", statement).strip()
+    return _PARAMETERS_RE.sub("(?...)", statement)
+
+
+@dataclass
+class Trace:
+    """Database activity of a single interaction or event listener."""
+
+    name: str
+    # command, autocomplete, view, modal or event
+    kind: str = "other"
+    started_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    duration: float = 0
+    statements: int = 0
+    db_time: float = 0
+    commits: int = 0
+    failed: bool = False
+    shapes: Counter[str] = field(default_factory=Counter)
+    _sessions: set[int] = field(default_factory=set, repr=False)
+    _start: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def sessions(self) -> int:
+        return len(self._sessions)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Return the statement shapes that ran more than threshold times."""
+        return [(s, n) for s, n in self.shapes.most_common() if n > threshold]
+
+
+class Tracer:
+    """Record the statements, sessions and commits of each interaction.
+
+    The current trace is kept in a context variable, so the SQLAlchemy events
+    are attributed to the interaction or listener running in the same task.
+    Traces without any database activity are not kept.
+    """
+
+    def __init__(
+        self,
+        *,
+        keep: int = TRACES_KEPT,
+        max_statements: int = MAX_STATEMENTS,
+        max_db_time: float = MAX_DB_TIME,
+        max_repeats: int = MAX_REPEATS,
+    ) -> None:
+        self.traces: deque[Trace] = deque(maxlen=keep)
+        self.max_statements = max_statements
+        self.max_db_time = max_db_time
+        self.max_repeats = max_repeats
+        # called with each finished trace, even without database activity
+        self.observers: list[Callable[[Trace], None]] = []
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> Tracer:
+        """Create the tracer from the [tracing] section of the config."""
+        names = {"keep", "max_statements", "max_db_time", "max_repeats"}
+        return cls(**read_section(config, "tracing", names))
+
+    @contextlib.contextmanager
+    def trace(self, name: str, kind: str = "other") -> Iterator[Trace]:
+        """Trace the database activity of the code run inside the block."""
+        trace = Trace(name=name, kind=kind)
+        token = CURRENT_TRACE.set(trace)
+        try:
+            yield trace
+        except BaseException:
+            trace.failed = True
+            raise
+        finally:
+            CURRENT_TRACE.reset(token)
+            trace.duration = time.perf_counter() - trace._start
+            self._finish(trace)
+
+    def _finish(self, trace: Trace) -> None:
+        for observer in self.observers:
+            try:
+                observer(trace)
+            except Exception:
+                LOGGER.exception("Trace observer failed.")
+
+        if trace.statements == 0:
+            return
+
+        self.traces.append(trace)
+
+        if trace.statements > self.max_statements or trace.db_time > self.max_db_time:
+            LOGGER.warning(
+                f"{trace.name} exceeded its database budget: "
+                f"{trace.statements} statements, {trace.sessions} sessions, "
+                f"{trace.commits} commits in {trace.db_time * 1000:.0f} ms."
+            )
+
+        for shape, count in trace.repeated(self.max_repeats):
+            LOGGER.warning(
+                f"Possible N+1 in {trace.name}, statement ran {count} times: "
+                f"{shape[:200]}"
+            )
+
+    def install(self) -> None:
+        """Trace every interaction and listener of all the bots of the process.
+
+        The SQLAlchemy events of all the engines and sessions are listened to,
+        and the methods of discord.py that run the interactions and listeners,
+        each in its own task, are wrapped. It can only be done once.
+        """
+        global _installed  # noqa: PLW0603
+        if _installed:
+            msg = "A tracer is already installed."
+            raise RuntimeError(msg)
+        _installed = True
+
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Session, "after_begin", _after_begin)
+        event.listen(Session, "after_commit", _after_commit)
+        _wrap_discord(self)
+
+
+def _before_cursor_execute(
+    conn: Any,  # noqa: ANN401, ARG001
+    cursor: Any,  # noqa: ANN401, ARG001
+    statement: str,  # noqa: ARG001
+    parameters: Any,  # noqa: ANN401, ARG001
+    context: Any,  # noqa: ANN401
+    executemany: bool,  # noqa: ARG001, FBT001
+) -> None:
+    if CURRENT_TRACE.get() is not None and context is not None:
+        context._trace_start = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn: Any,  # noqa: ANN401, ARG001
+    cursor: Any,  # noqa: ANN401, ARG001
+    statement: str,
+    parameters: Any,  # noqa: ANN401, ARG001
+    context: Any,  # noqa: ANN401
+    executemany: bool,  # noqa: ARG001, FBT001
+) -> None:
+    trace = CURRENT_TRACE.get()
+    if trace is None:
+        return
+
+    trace.statements += 1
+    trace.shapes[statement_shape(statement)] += 1
+    start = getattr(context, "_trace_start", None)
+    if start is not None:
+        trace.db_time += time.perf_counter() - start
+
+
+def _after_begin(
+    session: Session,
+    transaction: Any,  # noqa: ANN401, ARG001
+    connection: Any,  # noqa: ANN401, ARG001
+) -> None:
+    if (trace := CURRENT_TRACE.get()) is not None:
+        trace._sessions.add(id(session))
+
+
+def _after_commit(session: Session) -> None:  # noqa: ARG001
+    if (trace := CURRENT_TRACE.get()) is not None:
+        trace.commits += 1
+
+
+def _wrap_discord(tracer: Tracer) -> None:
+    call = app_commands.CommandTree._call
+
+    @functools.wraps(call)
+    async def _call(
+        self: app_commands.CommandTree, interaction: discord.Interaction
+    ) -> None:
+        with tracer.trace("command", "command") as trace:
+            try:
+                await call(self, interaction)
+            finally:
+                trace.name = _command_name(interaction)
+                if interaction.type is discord.InteractionType.autocomplete:
+                    trace.kind = "autocomplete"
+
+    view_task = ui.view.BaseView._scheduled_task
+
+    @functools.wraps(view_task)
+    async def _view_task(
+        self: ui.View, item: ui.Item, interaction: discord.Interaction
+    ) -> None:
+        label = getattr(item, "label", None) or type(item).__name__
+        with tracer.trace(f"view {type(self).__name__} {label}", "view"):
+            await view_task(self, item, interaction)
+
+    modal_task = ui.Modal._scheduled_task
+
+    @functools.wraps(modal_task)
+    async def _modal_task(
+        self: ui.Modal,
+        *args: Any,  # noqa: ANN401
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        with tracer.trace(f"modal {type(self).__name__}", "modal"):
+            await modal_task(self, *args, **kwargs)
+
+    run_event = discord.Client._run_event
+
+    @functools.wraps(run_event)
+    async def _run_event(
+        self: discord.Client,
+        coro: Callable[..., Any],
+        event_name: str,
+        *args: Any,  # noqa: ANN401
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        with tracer.trace(f"event {event_name}", "event"):
+            await run_event(self, coro, event_name, *args, **kwargs)
+
+    app_commands.CommandTree._call = _call  # type: ignore[method-assign]
+    ui.view.BaseView._scheduled_task = _view_task  # type: ignore[method-assign]
+    ui.Modal._scheduled_task = _modal_task  # type: ignore[method-assign]
+    discord.Client._run_event = _run_event  # type: ignore[method-assign]
+
+
+def _command_name(interaction: discord.Interaction) -> str:
+    command = interaction.command
+    name = command.qualified_name if command is not None else "unknown"
+    if interaction.type is discord.InteractionType.autocomplete:
+        return f"autocomplete /{name}"
+    return f"/{name}"
@@ -0,0 +1,141 @@
+"""Benchmark and check the avatar event resolution against a local repository.
+
+Run from the root of the project, with the path to a checkout of the
+HatBot-Avatar repository:
+
+    python -m scripts.bench_avatar ../HatBot-Avatar
+
+Without a path, a generated repository with one event per month is used.
+Every day of the year is resolved with the compiled table and compared to a
+naive linear search through the events, then the timings are printed.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from cogs.Avatar.avatar import (
+    YEAR,
+    AvatarRepository,
+    Event,
+    compile_events,
+    parse_events,
+)
+from cogs.Avatar.backends import LocalBackend
+
+SAMPLE_EVENT = """
+[{name}]
+file_name = "avatar.png"
+start_date = "{start:%B %d}"
+end_date = "{end:%B %d}"
+"""
+
+SAMPLE_FALLBACK = """
+[default]
+file_name = "avatar.png"
+fallback = true
+"""
+
+
+def make_sample_repository(root: Path) -> None:
+    """Write a repository with a fallback and an event in each month."""
+    config = [SAMPLE_FALLBACK]
+    for month in range(1, 13):
+        start = date(YEAR, month, 10)
+        name = f"event_{month:02}"
+        config.append(
+            SAMPLE_EVENT.format(name=name, start=start, end=start + timedelta(days=6))
+        )
+        (root / name).mkdir()
+        (root / name / "avatar.png").write_bytes(b"\x89PNG" + bytes(month))
+
+    (root / "default").mkdir()
+    (root / "default" / "avatar.png").write_bytes(b"\x89PNG")
+    (root / "config.toml").write_text("".join(config))
+
+
+def resolve_linear(events: list[Event], day: date) -> Event | None:
+    """Resolve the event of the day the slow way, as a reference."""
+    for event in events:
+        if event.fallback:
+            continue
+        if event.start_date <= day <= event.end_date:  # type: ignore[operator]
+            return event
+
+    return next((event for event in events if event.fallback), None)
+
+
+def timeit(label: str, func, number: int) -> None:  # noqa: ANN001
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / number * 1e6:10.2f} us/op ({number} runs)")
+
+
+async def bench(root: Path, number: int) -> None:
+    backend = LocalBackend(root)
+    config_raw = await backend.fetch("config.toml")
+    events = parse_events(config_raw)
+    table = compile_events(events, "bench")
+
+    # check the table against the reference, for every day of the year
+    day = date(YEAR, 1, 1)
+    while day.year == YEAR:
+        expected = resolve_linear(events, day)
+        assert table.lookup(day.month, day.day) == expected, day
+        day += timedelta(days=1)
+    print(f"Table matches the linear search for all days ({len(events)} events).")
+
+    # check that every event avatar can be read from the repository
+    for event in events:
+        await AvatarRepository(backend).fetch_event_avatar(event)
+
+    timeit("parse_events", lambda: parse_events(config_raw), number)
+    timeit("compile_events", lambda: compile_events(events, "bench"), number)
+    today = date.today()  # noqa: DTZ011
+    timeit(
+        "linear search",
+        lambda: resolve_linear(events, today.replace(year=YEAR)),
+        number * 10,
+    )
+    timeit("table lookup", lambda: table.lookup(today.month, today.day), number * 10)
+
+    with tempfile.TemporaryDirectory() as table_dir:
+        repository = AvatarRepository(
+            backend, table_path=Path(table_dir) / "events_table.json"
+        )
+        start = time.perf_counter()
+        await repository.get_current_event()
+        print(f"{'get_current_event (cold)':<28} {time.perf_counter() - start:10.6f} s")
+
+        start = time.perf_counter()
+        for _ in range(number):
+            await repository.get_current_event()
+        elapsed = time.perf_counter() - start
+        print(
+            f"{'get_current_event (warm)':<28} "
+            f"{elapsed / number * 1e6:10.2f} us/op ({number} runs)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("repository", nargs="?", type=Path)
+    parser.add_argument("-n", "--number", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.repository is not None:
+        asyncio.run(bench(args.repository, args.number))
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        make_sample_repository(Path(root))
+        asyncio.run(bench(Path(root), args.number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Microbenchmarks of the checks of cogs.utils.checks.
+
+Run from the root of the project:
+
+    python -m scripts.bench_checks --roles 250 --latency 100
+
+The role lookup of has_role_or_above is timed with a linear search through
+guild.roles, like before, and with the RoleIndex. The owner check of clients
+that are not a commands.Bot is timed with an application_info call on every
+check, like before, and with the cached OwnerIds. The API is simulated with
+the given latency, in milliseconds.
+"""
+
+import argparse
+import asyncio
+import time
+import timeit
+from types import SimpleNamespace
+from typing import Any
+
+import discord
+from discord.state import ConnectionState
+
+from cogs.utils.checks import OwnerIds, RoleIndex, has_role_or_above
+
+
+def make_guild(roles: int) -> discord.Guild:
+    state = ConnectionState(
+        dispatch=lambda *_, **__: None,
+        handlers={},
+        hooks={},
+        http=SimpleNamespace(),  # type: ignore[arg-type]
+        intents=discord.Intents.default(),
+    )
+    data: Any = {
+        "id": "1",
+        "name": "Guild",
+        "roles": [
+            {
+                "id": str(i + 1),
+                "name": "@everyone" if i == 0 else f"Role {i}",
+                "permissions": "0",
+                "position": i,
+                "color": 0,
+                "hoist": False,
+                "managed": False,
+                "mentionable": False,
+            }
+            for i in range(roles)
+        ],
+    }
+    return discord.Guild(data=data, state=state)
+
+
+def report(label: str, seconds: float, number: int) -> None:
+    print(f"{label:<40} {seconds / number * 1e6:10.2f} µs")
+
+
+def bench_roles(roles: int, number: int) -> None:
+    guild = make_guild(roles)
+    # the highest role is the worst case of the linear search
+    name, role_id = f"Role {roles - 1}", roles
+    index = RoleIndex()
+
+    for label, lookup in [
+        ("linear search by name", lambda: discord.utils.get(guild.roles, name=name)),
+        ("linear search by id", lambda: discord.utils.get(guild.roles, id=role_id)),
+        ("RoleIndex by name", lambda: index.get(guild, name)),
+        ("RoleIndex by id", lambda: index.get(guild, role_id)),
+    ]:
+        assert lookup() is guild.get_role(role_id)
+        report(label, timeit.timeit(lookup, number=number), number)
+
+    # the whole check, as run by discord.ext.commands
+    def callback() -> None: ...
+
+    has_role_or_above(name)(callback)
+    predicate = callback.__commands_checks__[0]  # type: ignore[attr-defined]
+    ctx: Any = SimpleNamespace(guild=guild, author=None)
+    report(
+        "has_role_or_above check",
+        timeit.timeit(lambda: predicate(ctx), number=number),
+        number,
+    )
+
+
+async def bench_owner(latency: float, number: int) -> None:
+    # every uncached call waits for the latency, fewer are enough
+    slow_number = max(number // 1000, 10)
+    app = SimpleNamespace(team=None, owner=SimpleNamespace(id=1))
+    calls = 0
+
+    async def application_info() -> Any:  # noqa: ANN401
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(latency)
+        return app
+
+    client: Any = SimpleNamespace(application_info=application_info)
+
+    start = time.perf_counter()
+    for _ in range(slow_number):
+        info = await client.application_info()
+        assert info.owner.id == 1
+    report("application_info on every check", time.perf_counter() - start, slow_number)
+    print(f"{'':<40} {calls} API calls")
+
+    calls = 0
+    owner_ids = OwnerIds()
+    start = time.perf_counter()
+    assert 1 in await owner_ids.get(client)
+    report("OwnerIds, first check", time.perf_counter() - start, 1)
+    start = time.perf_counter()
+    for _ in range(number):
+        assert 1 in await owner_ids.get(client)
+    report("OwnerIds, next checks", time.perf_counter() - start, number)
+    print(f"{'':<40} {calls} API calls")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--roles", type=int, default=250)
+    parser.add_argument("--number", type=int, default=10_000)
+    parser.add_argument("--latency", type=float, default=100, help="milliseconds")
+    args = parser.parse_args()
+
+    bench_roles(args.roles, args.number)
+    asyncio.run(bench_owner(args.latency / 1000, args.number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Compare the memory and startup cost of the full and lazy member caches.
+
+Run from the root of the project:
+
+    python -m scripts.bench_member_cache --members 20000 --guilds 2
+
+Members are built by discord.py from payloads like the ones of the gateway,
+and the memory they take is measured with tracemalloc. In full mode, every
+member of every guild is cached at startup, in chunks of 1000 members sent by
+the gateway. In lazy mode, at most max_size members are cached, when needed.
+The wall time of the chunking depends on the gateway: compare the "Ready in"
+lines logged by the bot in both modes for the real value.
+"""
+
+import argparse
+import math
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any
+
+import discord
+from discord.state import ConnectionState
+
+from cogs.utils.members import MemberCache, MemberCacheSettings
+
+# members sent in each GUILD_MEMBERS_CHUNK event
+CHUNK_SIZE = 1000
+
+
+def make_guild(state: ConnectionState, guild_id: int) -> discord.Guild:
+    everyone = {
+        "id": str(guild_id),
+        "name": "@everyone",
+        "permissions": "0",
+        "position": 0,
+        "color": 0,
+        "hoist": False,
+        "managed": False,
+        "mentionable": False,
+    }
+    data: Any = {"id": str(guild_id), "name": "Guild", "roles": [everyone]}
+    return discord.Guild(data=data, state=state)
+
+
+def make_member(
+    state: ConnectionState, guild: discord.Guild, user_id: int
+) -> discord.Member:
+    data: Any = {
+        "user": {
+            "id": str(user_id),
+            "username": f"user{user_id}",
+            "discriminator": "0",
+            "global_name": f"User {user_id}",
+            "avatar": "0" * 32,
+        },
+        "nick": None,
+        "roles": [],
+        "joined_at": "2024-10-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+    return discord.Member(data=data, guild=guild, state=state)
+
+
+def cache_members(
+    members: int, guilds: int, max_size: int | None
+) -> tuple[list[discord.Guild], MemberCache]:
+    """Cache the members like the full mode, or like the lazy mode if max_size."""
+    state = ConnectionState(
+        dispatch=lambda *_, **__: None,
+        handlers={},
+        hooks={},
+        http=SimpleNamespace(),  # type: ignore[arg-type]
+        intents=discord.Intents.default() | discord.Intents(members=True),
+    )
+    all_guilds = [make_guild(state, guild_id) for guild_id in range(1, guilds + 1)]
+    cache = MemberCache(MemberCacheSettings(max_size=max_size or 0))
+
+    for i in range(members):
+        guild = all_guilds[i % guilds]
+        member = make_member(state, guild, 10**17 + i)
+        if max_size is None:
+            # what discord.py does with the chunks, in full mode
+            guild._add_member(member)
+        else:
+            # lazy mode, the members fetched on demand
+            cache.put(member)
+    return all_guilds, cache
+
+
+def measure(members: int, guilds: int, max_size: int | None) -> tuple[float, float]:
+    """Return the memory taken by the cached members in bytes, and the time."""
+    start = time.perf_counter()
+    cache_members(members, guilds, max_size)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    cached = cache_members(members, guilds, max_size)
+    memory, _ = tracemalloc.get_traced_memory()
+    del cached
+    tracemalloc.stop()
+
+    return memory, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=20_000, help="in total")
+    parser.add_argument("--guilds", type=int, default=2)
+    parser.add_argument("--max-size", type=int, default=MemberCacheSettings.max_size)
+    args = parser.parse_args()
+
+    full_memory, full_time = measure(args.members, args.guilds, None)
+    lazy_members = min(args.members, args.max_size)
+    lazy_memory, _ = measure(lazy_members, args.guilds, args.max_size)
+    chunks = args.guilds * math.ceil(args.members / args.guilds / CHUNK_SIZE)
+
+    mib = 1024 * 1024
+    print(
+        f"full: {args.members} members, {full_memory / mib:.1f} MiB, "
+        f"{chunks} chunks and {full_time * 1000:.0f} ms building members at startup"
+    )
+    print(
+        f"lazy: at most {lazy_members} members, {lazy_memory / mib:.1f} MiB, "
+        "nothing at startup"
+    )
+    print(
+        f"saved: {(full_memory - lazy_memory) / mib:.1f} MiB, "
+        f"{chunks} gateway chunks and {full_time * 1000:.0f} ms of startup CPU time"
+    )
+
+
+if __name__ == "__main__":
+    main()
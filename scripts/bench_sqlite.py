@@ -0,0 +1,105 @@
+"""Benchmark the write throughput of SQLite, with and without the engine tuning.
+
+Run from the root of the project:
+
+    python -m scripts.bench_sqlite --writers 8 --transactions 200 --readers 4
+
+Each writer commits many small transactions, like the Halloween and Giveaways
+cogs do during a burst, while readers query the table in a loop.
+The same workload runs on a new database with SQLite's default settings, then
+with the DatabaseProfile from cogs.utils.database.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from cogs.utils.database import DatabaseProfile, tune_engine
+
+
+async def writer(engine: AsyncEngine, transactions: int, errors: list[int]) -> None:
+    for i in range(transactions):
+        try:
+            async with engine.begin() as connection:
+                await connection.execute(
+                    text("INSERT INTO entry (user_id, value) VALUES (:u, :v)"),
+                    {"u": i % 100, "v": i},
+                )
+        except OperationalError:
+            errors[0] += 1
+
+
+async def reader(engine: AsyncEngine, stop: asyncio.Event, reads: list[int]) -> None:
+    while not stop.is_set():
+        try:
+            async with engine.connect() as connection:
+                await connection.scalar(
+                    text("SELECT count(*) FROM entry WHERE user_id = 1")
+                )
+            reads[0] += 1
+        except OperationalError:
+            pass
+        await asyncio.sleep(0)
+
+
+async def run(profile: DatabaseProfile | None, args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}",
+            pool_size=args.writers + args.readers,
+        )
+        if profile is not None:
+            await tune_engine(engine, profile)
+
+        async with engine.begin() as connection:
+            await connection.execute(
+                text(
+                    "CREATE TABLE entry "
+                    "(id INTEGER PRIMARY KEY, user_id INTEGER, value INTEGER)"
+                )
+            )
+
+        errors, reads = [0], [0]
+        stop = asyncio.Event()
+        readers = [
+            asyncio.create_task(reader(engine, stop, reads))
+            for _ in range(args.readers)
+        ]
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(writer(engine, args.transactions, errors) for _ in range(args.writers))
+        )
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*readers)
+        await engine.dispose()
+
+    writes = args.writers * args.transactions - errors[0]
+    label = "tuned" if profile is not None else "default"
+    print(
+        f"{label:<8} {writes / elapsed:10.1f} writes/s "
+        f"{reads[0] / elapsed:10.1f} reads/s "
+        f"{errors[0]:6} failed writes ({elapsed:.2f} s)"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--transactions", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    await run(None, args)
+    await run(DatabaseProfile(), args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
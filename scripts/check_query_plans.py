@@ -0,0 +1,375 @@
+"""Check the query plans of the hot queries of the Halloween and Giveaways cogs.
+
+Run from the root of the project:
+
+    python -m scripts.check_query_plans           # compare with the snapshot
+    python -m scripts.check_query_plans --update  # write a new snapshot
+
+The database helpers of the cogs are run against a seeded database, every
+SELECT and UPDATE they issue is captured, and EXPLAIN QUERY PLAN is run on it.
+The check fails if a query scans a whole table or sorts with a temporary
+B-tree (unless it is allowed below), or if the plans differ from the snapshot
+in scripts/query_plans.txt. Commit the snapshot with the code that changes it.
+"""
+
+import argparse
+import asyncio
+import difflib
+import random
+import re
+import sys
+import tempfile
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+from snapcogs.database import Base
+from sqlalchemy import Connection, event, insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from cogs.Giveaways.giveaways import Giveaways
+from cogs.Giveaways.models import Entry, Game, Giveaway, Notification, View
+from cogs.Halloween.base import BaseTreat
+from cogs.Halloween.halloween import Halloween
+from cogs.Halloween.models import Event, EventLog, Loot, Treat
+from cogs.Halloween.trophies import Milestone, MilestoneLog, Trophies
+from cogs.utils.migrations import run_migrations
+
+SNAPSHOT_PATH = Path(__file__).parent / "query_plans.txt"
+
+# Queries allowed to scan or sort, with the reason why
+ALLOWED: dict[str, str] = {
+    "halloween._get_guild_scores": "sorting by an aggregate needs a temporary B-tree",
+    "giveaways._get_ongoing_giveaways": "giveaways are few, and mostly done",
+    "giveaways._get_remaining_stats": "counting distinct titles needs a B-tree",
+    "outbox._get_pending_notifications": "notifications are few, and mostly delivered",
+}
+
+GUILDS = 2
+MEMBERS = 500
+GAMES = 20_000
+GIVEAWAYS = 50
+ENTRIES = 2_000
+
+
+class PlanBot:
+    """The parts of the Bot used by the database helpers."""
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.db = SimpleNamespace(
+            session=async_sessionmaker(engine, expire_on_commit=False)
+        )
+        self.cogs: dict[str, Any] = {}
+
+    def get_cog(self, name: str) -> Any:  # noqa: ANN401
+        return self.cogs.get(name)
+
+    def get_user(self, user_id: int) -> Any:  # noqa: ANN401
+        return SimpleNamespace(id=user_id)
+
+
+def member(guild_id: int, user_id: int) -> Any:  # noqa: ANN401
+    return SimpleNamespace(
+        id=user_id,
+        guild=SimpleNamespace(id=guild_id),
+        display_name=f"Member {user_id}",
+    )
+
+
+async def seed(engine: AsyncEngine, treats: list[BaseTreat]) -> None:
+    """Fill the database with data of a plausible size, then ANALYZE it."""
+    rng = random.Random(0)  # noqa: S311
+    now = datetime.now(UTC)
+    loot_names = [f"Loot {i}" for i in range(30)]
+    rows: dict[Any, list[dict[str, Any]]] = {
+        Treat: [],
+        Loot: [],
+        EventLog: [],
+        MilestoneLog: [],
+        Game: [],
+        Giveaway: [],
+        View: [],
+        Entry: [],
+        Notification: [],
+    }
+    for guild_id in range(1, GUILDS + 1):
+        for user_id in range(1, MEMBERS + 1):
+            ids = {"guild_id": guild_id, "user_id": user_id}
+            rows[Treat] += [
+                {**ids, "name": t.name, "emoji": t.emoji, "amount": 3} for t in treats
+            ]
+            rows[Loot] += [
+                {**ids, "name": name, "rarity": "common", "amount": 1}
+                for name in rng.sample(loot_names, 10)
+            ]
+            rows[EventLog] += [
+                {**ids, "event": rng.choice(list(Event)), "created_at": now}
+                for _ in range(20)
+            ]
+            rows[MilestoneLog] += [
+                {**ids, "milestone": milestone}
+                for milestone in rng.sample(list(Milestone), 3)
+            ]
+
+    rows[Game] = [
+        {
+            "key": f"KEY-{i:06}",
+            "title": f"Game {i % 2000:04}",
+            "url": "https://example.com",
+            "given": i % 3 == 0,
+        }
+        for i in range(GAMES)
+    ]
+    rows[Giveaway] = [
+        {
+            "channel_id": 1,
+            "created_at": now,
+            "game_id": i + 1,
+            "is_done": i > 2,
+            "message_id": 1000 + i,
+            "trigger_at": now,
+        }
+        for i in range(GIVEAWAYS)
+    ]
+    rows[View] = [{"guild_id": 1, "message_id": 1000 + i} for i in range(GIVEAWAYS)]
+    rows[Entry] = [
+        {"giveaway_id": giveaway_id, "user_id": user_id}
+        for giveaway_id in range(1, GIVEAWAYS + 1)
+        for user_id in range(1, ENTRIES + 1)
+    ]
+    rows[Notification] = [
+        {
+            "giveaway_id": 1,
+            "kind": "USER_DM",
+            "target_id": 1,
+            "attempts": 0,
+            "delivered": True,
+        }
+        for _ in range(100)
+    ]
+
+    async with engine.begin() as connection:
+        for model, values in rows.items():
+            await connection.execute(insert(model), values)
+        await connection.execute(text("ANALYZE"))
+
+
+async def run_helpers(
+    bot: PlanBot, record: Callable[[str], None], treats: list[BaseTreat]
+) -> None:
+    """Run the database helpers, labelling the statements they issue."""
+    halloween = Halloween(bot)  # type: ignore[arg-type]
+    halloween.increase_trick_or_treater_spawn_rate.cancel()
+    halloween.treats = treats
+    bot.cogs["Halloween"] = halloween
+    trophies = Trophies(bot)  # type: ignore[arg-type]
+    giveaways = Giveaways(bot)  # type: ignore[arg-type]
+
+    someone = member(1, 42)
+    message = SimpleNamespace(id=123)
+    loot = {"name": "Loot 1", "rarity": "common"}
+
+    calls: list[tuple[str, Callable[[], Awaitable[Any]]]] = [
+        ("halloween._check_free_treats", lambda: halloween._check_free_treats(someone)),
+        (
+            "halloween._add_treat_to_inventory",
+            lambda: halloween._add_treat_to_inventory(treats[0], someone),
+        ),
+        (
+            "halloween._remove_treat_from_inventory",
+            lambda: halloween._remove_treat_from_inventory(treats[0], someone),
+        ),
+        (
+            "halloween._get_member_inventory",
+            lambda: halloween._get_member_inventory(someone),
+        ),
+        (
+            "halloween._check_member_able_to_give",
+            lambda: halloween._check_member_able_to_give(someone, message),
+        ),
+        (
+            "halloween._add_loot_to_member",
+            lambda: halloween._add_loot_to_member(loot, someone),
+        ),
+        (
+            "halloween._remove_loot_from_member",
+            lambda: halloween._remove_loot_from_member(loot, someone),
+        ),
+        ("halloween._get_member_loot", lambda: halloween._get_member_loot(someone)),
+        (
+            "halloween._get_member_display_name",
+            lambda: halloween._get_member_display_name(someone),
+        ),
+        (
+            "halloween._get_guild_scores",
+            lambda: halloween._get_guild_scores(someone.guild),
+        ),
+        ("trophies.get_milestones", lambda: trophies.get_milestones(someone)),
+        (
+            "trophies._check_milestone",
+            lambda: trophies._check_milestone(someone, Milestone.FIRST_LOOT),
+        ),
+        ("giveaways._get_ongoing_giveaways", giveaways._get_ongoing_giveaways),
+        ("giveaways._get_remaining_stats", giveaways._get_remaining_stats),
+        (
+            "giveaways._get_remaining_titles",
+            lambda: giveaways._get_remaining_titles(2, 10),
+        ),
+        ("giveaways._build_search_indexes", giveaways._build_search_indexes),
+        ("giveaways._count_entries", lambda: giveaways._count_entries(1)),
+        ("giveaways._get_entry_user_id", lambda: giveaways._get_entry_user_id(1, 500)),
+        (
+            "giveaways._insert_games_chunk",
+            lambda: giveaways._insert_games_chunk(
+                {"KEY-000001": {"key": "KEY-000001", "title": "A", "url": "B"}},
+                SimpleNamespace(inserted=0, duplicates=0),  # type: ignore[arg-type]
+            ),
+        ),
+        (
+            "giveaways._re_add_game_key",
+            lambda: giveaways._re_add_game_key("KEY-000003"),
+        ),
+        (
+            "outbox._get_pending_notifications",
+            giveaways.outbox._get_pending_notifications,
+        ),
+    ]
+
+    for label, call in calls:
+        record(label)
+        await call()
+
+    record("giveaways._claim_random_game")
+    game = await giveaways._claim_random_game()
+    record("giveaways._edit_game")
+    await giveaways._edit_game(game, given=False)  # type: ignore[arg-type]
+
+
+def create_schema(connection: Connection) -> None:
+    """Create the tables, then their indexes sorted by name.
+
+    Table.indexes is a set, so create_all creates them in an order that changes
+    between runs, and SQLite picks the first of two indexes of equal cost.
+    """
+    Base.metadata.create_all(connection)
+    for table in Base.metadata.sorted_tables:
+        indexes = sorted(table.indexes, key=lambda index: index.name or "")
+        for index in indexes:
+            index.drop(connection)
+        for index in indexes:
+            index.create(connection)
+
+
+def normalize(statement: str) -> str:
+    return re.sub(r"\s+", " ", statement).strip()
+
+
+def bad_steps(plan: list[str]) -> list[str]:
+    """Return the steps of the plan that scan a whole table or sort in a B-tree."""
+    return [
+        step
+        for step in plan
+        if (step.startswith("SCAN ") and " USING " not in step)
+        or "USE TEMP B-TREE" in step
+    ]
+
+
+async def collect_plans() -> dict[tuple[str, str], list[str]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'plans.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(create_schema)
+        await run_migrations(engine)
+
+        bot = PlanBot(engine)
+        treats = [BaseTreat(name=f"Treat {i}", emoji="🍬") for i in range(8)]
+        await seed(engine, treats)
+
+        captured: list[tuple[str, str, Any]] = []
+        label = "setup"
+
+        def set_label(new_label: str) -> None:
+            nonlocal label
+            label = new_label
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def capture(
+            conn: Any,  # noqa: ANN401, ARG001
+            cursor: Any,  # noqa: ANN401, ARG001
+            statement: str,
+            parameters: Any,  # noqa: ANN401
+            context: Any,  # noqa: ANN401, ARG001
+            executemany: bool,  # noqa: ARG001, FBT001
+        ) -> None:
+            if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "WITH")):
+                captured.append((label, statement, parameters))
+
+        await run_helpers(bot, set_label, treats)
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+        plans: dict[tuple[str, str], list[str]] = {}
+        async with engine.connect() as connection:
+            for label, statement, parameters in captured:
+                key = (label, normalize(statement))
+                if key in plans:
+                    continue
+                rows = await connection.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)
+                )
+                plans[key] = [row[3] for row in rows]
+
+        await engine.dispose()
+
+    return plans
+
+
+def render(plans: dict[tuple[str, str], list[str]]) -> str:
+    lines = []
+    for (label, statement), plan in sorted(plans.items()):
+        lines.append(f"## {label}")
+        lines.append(statement)
+        lines.extend(f"    {step}" for step in plan)
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="write the snapshot")
+    args = parser.parse_args()
+
+    plans = asyncio.run(collect_plans())
+    failed = False
+
+    for (label, statement), plan in sorted(plans.items()):
+        if (steps := bad_steps(plan)) and label not in ALLOWED:
+            failed = True
+            print(f"FAIL {label}: {', '.join(steps)}\n    {statement}")
+
+    snapshot = render(plans)
+    if args.update:
+        SNAPSHOT_PATH.write_text(snapshot)
+        print(f"Wrote {len(plans)} query plans to {SNAPSHOT_PATH}.")
+    else:
+        previous = SNAPSHOT_PATH.read_text() if SNAPSHOT_PATH.exists() else ""
+        if previous != snapshot:
+            failed = True
+            print("Query plans differ from the snapshot (run with --update):")
+            sys.stdout.writelines(
+                difflib.unified_diff(
+                    previous.splitlines(keepends=True),
+                    snapshot.splitlines(keepends=True),
+                    "query_plans.txt",
+                    "current",
+                )
+            )
+        else:
+            print(f"{len(plans)} query plans match the snapshot.")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Tests of the on-disk cache of the avatar repository files.
+
+The repository is stood in for by a local aiohttp server, which answers with
+the ETag of its current content, and with 304 Not Modified when it matches.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+import aiohttp
+from aiohttp import web
+
+from cogs.Avatar.backends import HttpBackend
+from cogs.Avatar.cache import FileCache
+
+
+class RepositoryServer:
+    """Local stand-in for raw.githubusercontent.com, serving a single file."""
+
+    def __init__(self) -> None:
+        self.content = b"version 1"
+        self.etag = '"v1"'
+        self.status: int | None = None
+        self.requests: list[dict[str, str]] = []
+        self.bodies_sent = 0
+
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        self.url = ""
+
+    async def start(self) -> None:
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests.append(dict(request.headers))
+        if self.status is not None:
+            return web.Response(status=self.status)
+        if request.headers.get("If-None-Match") == self.etag:
+            return web.Response(status=304)
+
+        self.bodies_sent += 1
+        return web.Response(body=self.content, headers={"ETag": self.etag})
+
+
+class TestFileCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_path = Path(tmp.name)
+
+        self.server = RepositoryServer()
+        await self.server.start()
+        self.addAsyncCleanup(self.server.stop)
+
+        session = aiohttp.ClientSession()
+        self.addAsyncCleanup(session.close)
+        self.bot = SimpleNamespace(http_session=session)
+        self.backend = self.make_backend()
+        self.file_url = f"{self.server.url}/config.toml"
+
+    def make_backend(self) -> HttpBackend:
+        """Return a backend with a new cache, reading the same directory."""
+        return HttpBackend(
+            self.bot,  # type: ignore[arg-type]
+            base_url=self.server.url,
+            cache=FileCache(self.cache_path),
+        )
+
+    def blobs(self) -> set[str]:
+        return {path.name for path in (self.cache_path / "blobs").iterdir()}
+
+    async def test_200_stores_the_file(self) -> None:
+        content = await self.backend.fetch("config.toml")
+
+        self.assertEqual(content, b"version 1")
+        cached = await self.backend.cache.get(self.file_url)
+        assert cached is not None
+        self.assertEqual(cached.etag, '"v1"')
+        self.assertEqual(self.blobs(), {cached.digest})
+        self.assertNotIn("If-None-Match", self.server.requests[0])
+
+    async def test_304_reads_the_cached_file(self) -> None:
+        await self.backend.fetch("config.toml")
+        # a new cache, like after a restart, loads the saved index
+        content = await self.make_backend().fetch("config.toml")
+
+        self.assertEqual(content, b"version 1")
+        self.assertEqual(self.server.requests[1]["If-None-Match"], '"v1"')
+        self.assertEqual(self.server.bodies_sent, 1)
+
+    async def test_changed_file_replaces_the_blob(self) -> None:
+        await self.backend.fetch("config.toml")
+        old = await self.backend.cache.get(self.file_url)
+        self.server.content, self.server.etag = b"version 2", '"v2"'
+
+        content = await self.backend.fetch("config.toml")
+
+        self.assertEqual(content, b"version 2")
+        new = await self.backend.cache.get(self.file_url)
+        assert old is not None
+        assert new is not None
+        self.assertNotEqual(old.digest, new.digest)
+        self.assertEqual(self.blobs(), {new.digest})
+
+    async def test_shared_blob_is_kept(self) -> None:
+        await self.backend.fetch("config.toml")
+        await self.backend.fetch("copy.toml")
+        cached = await self.backend.cache.get(self.file_url)
+        self.server.content, self.server.etag = b"version 2", '"v2"'
+
+        await self.backend.fetch("config.toml")
+
+        # copy.toml still refers to the first version
+        assert cached is not None
+        self.assertIn(cached.digest, self.blobs())
+        self.assertEqual(len(self.blobs()), 2)
+
+    async def test_unused_blobs_are_removed_on_load(self) -> None:
+        await self.backend.fetch("config.toml")
+        cached = await self.backend.cache.get(self.file_url)
+        (self.cache_path / "blobs" / ("0" * 64)).write_bytes(b"orphan")
+        (self.cache_path / "blobs" / ".interrupted.tmp").write_bytes(b"partial")
+
+        await self.make_backend().cache.get(self.file_url)
+
+        assert cached is not None
+        self.assertEqual(self.blobs(), {cached.digest})
+
+    async def test_network_failure_reads_the_cached_file(self) -> None:
+        await self.backend.fetch("config.toml")
+        await self.server.stop()
+
+        content = await self.make_backend().fetch("config.toml")
+
+        self.assertEqual(content, b"version 1")
+
+    async def test_server_error_reads_the_cached_file(self) -> None:
+        await self.backend.fetch("config.toml")
+        self.server.status = 503
+
+        content = await self.backend.fetch("config.toml")
+
+        self.assertEqual(content, b"version 1")
+
+    async def test_network_failure_without_cache_raises(self) -> None:
+        await self.server.stop()
+
+        with self.assertRaises(RuntimeError):
+            await self.backend.fetch("config.toml")
+
+    async def test_missing_blob_downloads_again(self) -> None:
+        await self.backend.fetch("config.toml")
+        cached = await self.backend.cache.get(self.file_url)
+        assert cached is not None
+        (self.cache_path / "blobs" / cached.digest).unlink()
+
+        content = await self.backend.fetch("config.toml")
+
+        self.assertEqual(content, b"version 1")
+        self.assertNotIn("If-None-Match", self.server.requests[1])
+        self.assertEqual(self.server.bodies_sent, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,262 @@
+"""Tests of the resolution of the avatar events, from a local repository."""
+
+import io
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+from cogs.Avatar import processing
+from cogs.Avatar.avatar import (
+    YEAR,
+    AvatarRepository,
+    AvatarSettings,
+    Event,
+    compile_events,
+    parse_events,
+)
+from cogs.Avatar.backends import HttpBackend, LocalBackend
+
+CONFIG = """
+[default]
+file_name = "default.png"
+fallback = true
+
+[new_year]
+file_name = "new_year.png"
+start_date = "December 30"
+end_date = "December 31"
+
+[leap_day]
+file_name = "leap_day.png"
+start_date = "February 29"
+end_date = "February 29"
+
+[halloween]
+file_name = "halloween.png"
+start_date = "October 01"
+end_date = "October 31"
+
+[winter]
+file_name = "winter.png"
+start_date = "December 01"
+end_date = "December 25"
+"""
+
+
+def resolve_linear(events: list[Event], day: date) -> Event | None:
+    """Resolve the event of the day the slow way, as a reference."""
+    for event in events:
+        if event.fallback:
+            continue
+        if event.start_date <= day <= event.end_date:  # type: ignore[operator]
+            return event
+
+    return next((event for event in events if event.fallback), None)
+
+
+class TestEventResolution(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name) / "HatBot-Avatar"
+        self.root.mkdir()
+        self.write_config(CONFIG)
+        for name in ("default", "new_year", "leap_day", "halloween", "winter"):
+            (self.root / name).mkdir()
+            (self.root / name / f"{name}.png").write_bytes(name.encode())
+
+        self.table_path = Path(tmp.name) / "events_table.json"
+        self.repository = self.make_repository()
+
+    def write_config(self, config: str) -> None:
+        (self.root / "config.toml").write_text(config)
+
+    def make_repository(self) -> AvatarRepository:
+        return AvatarRepository(LocalBackend(self.root), table_path=self.table_path)
+
+    async def test_every_day_matches_the_linear_search(self) -> None:
+        events = parse_events(CONFIG.encode())
+
+        day = date(YEAR, 1, 1)
+        while day.year == YEAR:
+            with self.subTest(day=day):
+                event = await self.repository.get_event(day)
+                self.assertEqual(event, resolve_linear(events, day))
+            day += timedelta(days=1)
+
+    async def test_events_and_fallback(self) -> None:
+        cases = {
+            date(2023, 10, 31): "halloween",
+            date(2023, 11, 1): "default",
+            date(2024, 2, 29): "leap_day",
+            date(2023, 3, 1): "default",
+            date(2023, 12, 25): "winter",
+            date(2023, 12, 26): "default",
+            date(2023, 12, 31): "new_year",
+        }
+        for day, name in cases.items():
+            with self.subTest(day=day):
+                event = await self.repository.get_event(day)
+                assert event is not None
+                self.assertEqual(event.name, name)
+
+    async def test_event_without_dates_raises(self) -> None:
+        self.write_config(CONFIG.replace("fallback = true", "fallback = false"))
+
+        with self.assertRaises(RuntimeError):
+            await self.repository.get_event(date(2023, 3, 1))
+
+    async def test_no_event_without_fallback(self) -> None:
+        self.write_config("[new_year]" + CONFIG.split("[new_year]")[1])
+
+        self.assertIsNone(await self.repository.get_event(date(2023, 3, 1)))
+
+    async def test_overlapping_events_raise(self) -> None:
+        self.write_config(CONFIG.replace("December 01", "October 20"))
+
+        with self.assertRaises(RuntimeError):
+            compile_events(parse_events((self.root / "config.toml").read_bytes()), "")
+
+    async def test_event_avatar_is_read_from_the_repository(self) -> None:
+        event = await self.repository.get_event(date(2023, 10, 15))
+
+        assert event is not None
+        self.assertEqual(await self.repository.fetch_event_avatar(event), b"halloween")
+
+    async def test_table_is_reused_after_a_restart(self) -> None:
+        await self.repository.get_event(date(2023, 10, 15))
+        saved = self.table_path.read_bytes()
+
+        repository = self.make_repository()
+        event = await repository.get_event(date(2023, 10, 15))
+
+        assert event is not None
+        self.assertEqual(event.name, "halloween")
+        self.assertEqual(self.table_path.read_bytes(), saved)
+
+    async def test_table_is_compiled_again_when_the_config_changes(self) -> None:
+        await self.repository.get_event(date(2023, 10, 15))
+        self.write_config(CONFIG.replace("October 01", "October 20"))
+
+        event = await self.repository.get_event(date(2023, 10, 15))
+
+        assert event is not None
+        self.assertEqual(event.name, "default")
+
+    async def test_invalid_config_keeps_the_previous_table(self) -> None:
+        await self.repository.get_event(date(2023, 10, 15))
+        self.write_config(CONFIG.replace("December 01", "October 20"))
+
+        with self.assertLogs("cogs.Avatar.avatar", "ERROR"):
+            event = await self.repository.get_event(date(2023, 10, 15))
+
+        assert event is not None
+        self.assertEqual(event.name, "halloween")
+
+    async def test_files_outside_the_repository_are_refused(self) -> None:
+        backend = LocalBackend(self.root)
+        (self.root.parent / "secret.txt").write_text("secret")
+
+        with self.assertRaises(RuntimeError):
+            await backend.fetch("../secret.txt")
+        with self.assertRaises(RuntimeError):
+            await backend.fetch("missing/missing.png")
+
+
+def make_png(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestStagedAvatars(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name) / "HatBot-Avatar"
+        (root / "halloween").mkdir(parents=True)
+        (root / "config.toml").write_text(CONFIG)
+        self.image_path = root / "halloween" / "halloween.png"
+        self.image_path.write_bytes(make_png("orange"))
+
+        self.staging_path = Path(tmp.name) / "staged"
+        self.event = Event(name="halloween", file_name="halloween.png")
+        self.prepare = mock.Mock(wraps=processing.prepare_avatar)
+        patcher = mock.patch("cogs.Avatar.avatar.prepare_avatar", self.prepare)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.repository = self.make_repository(root)
+
+    def make_repository(self, root: Path) -> AvatarRepository:
+        return AvatarRepository(LocalBackend(root), staging_path=self.staging_path)
+
+    def staged(self) -> list[Path]:
+        return sorted((self.staging_path / "halloween").iterdir())
+
+    async def test_staged_avatar_is_reused(self) -> None:
+        first = await self.repository.get_staged_avatar(self.event)
+        second = await self.repository.get_staged_avatar(self.event)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.prepare.call_count, 1)
+        with Image.open(io.BytesIO(first)) as image:
+            self.assertEqual(image.size, (processing.AVATAR_SIZE,) * 2)
+
+    async def test_changed_image_is_prepared_again(self) -> None:
+        first = await self.repository.get_staged_avatar(self.event)
+        old_staged = self.staged()
+        self.image_path.write_bytes(make_png("purple"))
+
+        second = await self.repository.get_staged_avatar(self.event)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.prepare.call_count, 2)
+        self.assertEqual(len(self.staged()), 1)
+        self.assertNotEqual(self.staged(), old_staged)
+
+    async def test_changed_settings_are_prepared_again(self) -> None:
+        await self.repository.get_staged_avatar(self.event)
+
+        with mock.patch.object(processing, "AVATAR_SIZE", 256):
+            await self.repository.get_staged_avatar(self.event)
+
+        self.assertEqual(self.prepare.call_count, 2)
+        self.assertEqual(len(self.staged()), 1)
+
+    async def test_avatar_staged_by_name_is_replaced(self) -> None:
+        legacy_path = self.staging_path / "halloween.png"
+        legacy_path.parent.mkdir(parents=True)
+        legacy_path.write_bytes(make_png("black"))
+
+        await self.repository.get_staged_avatar(self.event)
+
+        self.assertEqual(self.prepare.call_count, 1)
+        self.assertFalse(legacy_path.exists())
+
+
+class TestAvatarSettings(unittest.TestCase):
+    def test_backend_from_the_settings(self) -> None:
+        bot = object()
+        local = AvatarRepository.from_settings(
+            bot,  # type: ignore[arg-type]
+            AvatarSettings.from_config({"avatar": {"repository_path": "."}}),
+        )
+        remote = AvatarRepository.from_settings(
+            bot,  # type: ignore[arg-type]
+            AvatarSettings.from_config({}),
+        )
+
+        self.assertIsInstance(local.backend, LocalBackend)
+        self.assertIsInstance(remote.backend, HttpBackend)
+
+    def test_unknown_settings_are_reported(self) -> None:
+        with self.assertLogs("cogs.utils.config", "WARNING"):
+            AvatarSettings.from_config({"avatar": {"repository": "."}})
+
+
+if __name__ == "__main__":
+    unittest.main()
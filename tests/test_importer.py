@@ -0,0 +1,109 @@
+"""Tests of the incremental parser of the giveaway game files."""
+
+import json
+import unittest
+from collections.abc import AsyncIterator, Iterable
+from typing import Any
+
+from cogs.Giveaways.importer import iter_json_array, validate_game
+
+DOCUMENT = """
+[
+    {"key": "AAAAA-BBBBB-CCCCC", "title": "Café Owner", "url": "https://a.b/c"},
+    {"key": "DDDDD", "title": "🎃 Pumpkin\\n\\"Jam\\"", "url": "https://a.b/d"},
+    1.5e3, -0.25, 10, 0, true, false, null,
+    "Éléphant 象", [1, [2.0E-1]], {}
+]
+"""
+
+
+async def iter_chunks(chunks: Iterable[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+def split(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+async def parse(chunks: Iterable[bytes]) -> list[Any]:
+    return [item async for item in iter_json_array(iter_chunks(chunks))]
+
+
+class TestIterJsonArray(unittest.IsolatedAsyncioTestCase):
+    async def test_every_chunk_size(self) -> None:
+        data = DOCUMENT.encode()
+        expected = json.loads(DOCUMENT)
+
+        for size in range(1, len(data) + 1):
+            with self.subTest(size=size):
+                self.assertEqual(await parse(split(data, size)), expected)
+
+    async def test_number_split_after_its_dot_or_exponent(self) -> None:
+        cases = {
+            (b"[1.", b"5e3]"): [1500.0],
+            (b"[1", b".5]"): [1.5],
+            (b"[2e", b"-1, 3]"): [0.2, 3],
+            (b"[-", b"7]"): [-7],
+            (b"[10", b"]"): [10],
+        }
+        for chunks, expected in cases.items():
+            with self.subTest(chunks=chunks):
+                self.assertEqual(await parse(chunks), expected)
+
+    async def test_multibyte_characters_split_between_chunks(self) -> None:
+        data = json.dumps(["é", "象", "🎃"], ensure_ascii=False).encode()
+
+        for size in (1, 2, 3):
+            with self.subTest(size=size):
+                self.assertEqual(await parse(split(data, size)), ["é", "象", "🎃"])
+
+    async def test_empty_array(self) -> None:
+        self.assertEqual(await parse([b" [ \n ] \n"]), [])
+
+    async def test_invalid_documents_raise(self) -> None:
+        cases = [
+            b"",
+            b"{}",
+            b"[1,]",
+            b"[,1]",
+            b"[1 2]",
+            b"[1",
+            b"[1] x",
+            b"[1][2]",
+            b'["unterminated]',
+            b"[1.x]",
+            b"[\xff]",
+        ]
+        for data in cases:
+            for size in (1, 64):
+                with self.subTest(data=data, size=size), self.assertRaises(ValueError):
+                    await parse(split(data, size))
+
+    async def test_items_before_the_error_are_yielded(self) -> None:
+        items = []
+        with self.assertRaises(ValueError):
+            async for item in iter_json_array(iter_chunks(split(b"[1, 2, oops]", 4))):
+                items.append(item)
+
+        self.assertEqual(items, [1, 2])
+
+
+class TestValidateGame(unittest.TestCase):
+    def test_valid_record_is_stripped(self) -> None:
+        record = {"key": " AAAAA ", "title": "Game", "url": "https://a.b", "x": 1}
+
+        self.assertEqual(
+            validate_game(record),
+            {"key": "AAAAA", "title": "Game", "url": "https://a.b"},
+        )
+
+    def test_invalid_records(self) -> None:
+        for record in (1500.0, None, [], {"key": "A", "title": "B"}, {"key": 1}):
+            with self.subTest(record=record):
+                self.assertIsNone(validate_game(record))
+        self.assertIsNone(validate_game({"key": " ", "title": "B", "url": "C"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
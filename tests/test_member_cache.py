@@ -0,0 +1,64 @@
+"""Tests of the cache of the guild members fetched from the API."""
+
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from cogs.utils.members import MemberCache, MemberCacheSettings
+
+
+class FakeGuild:
+    """Guild whose members discord.py caches, and the ones only the API knows."""
+
+    def __init__(self, cached: list[int], remote: list[int], *, chunked: bool) -> None:
+        self.id = 1
+        self.chunked = chunked
+        self._cached = {user_id: self.member(user_id) for user_id in cached}
+        self._remote = {user_id: self.member(user_id) for user_id in remote}
+        self.query_members = mock.AsyncMock(side_effect=self._query_members)
+
+    def member(self, user_id: int) -> SimpleNamespace:
+        return SimpleNamespace(id=user_id, guild=self)
+
+    def get_member(self, user_id: int) -> SimpleNamespace | None:
+        return self._cached.get(user_id)
+
+    async def _query_members(
+        self, *, user_ids: list[int], limit: int, cache: bool
+    ) -> list[SimpleNamespace]:
+        return [self._remote[i] for i in user_ids if i in self._remote][:limit]
+
+
+class TestMemberCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.cache = MemberCache(MemberCacheSettings(mode="lazy", max_size=2))
+
+    async def fetch_many(self, guild: FakeGuild, user_ids: list[int]) -> set[int]:
+        members = await self.cache.fetch_many(guild, user_ids)  # type: ignore[arg-type]
+        return set(members)
+
+    async def test_fetched_members_are_cached(self) -> None:
+        guild = FakeGuild([1], [2, 3], chunked=False)
+
+        self.assertEqual(await self.fetch_many(guild, [1, 2, 3, 4]), {1, 2, 3})
+        self.assertEqual(await self.fetch_many(guild, [1, 2, 3]), {1, 2, 3})
+        guild.query_members.assert_awaited_once()
+
+    async def test_oldest_members_are_evicted(self) -> None:
+        guild = FakeGuild([], [1, 2, 3], chunked=False)
+
+        await self.fetch_many(guild, [1, 2, 3])
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get(guild, 1))  # type: ignore[arg-type]
+
+    async def test_departed_members_of_a_chunked_guild_are_not_fetched(self) -> None:
+        guild = FakeGuild([1, 2], [3], chunked=True)
+
+        self.assertEqual(await self.fetch_many(guild, [1, 2, 3]), {1, 2})
+        self.assertIsNone(await self.cache.fetch(guild, 3))  # type: ignore[arg-type]
+        guild.query_members.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Tests of the hot reload of the presence playlist."""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from cogs.Presence.playlist import Activity, Playlist
+
+
+class TestPlaylistRefresh(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "activities.toml"
+        self.playlist = Playlist(self.path)
+        self.mtime_ns = 0
+
+    def write(self, content: str) -> None:
+        self.path.write_text(content)
+        # the modification time might not change within the same test
+        self.mtime_ns += 1_000_000_000
+        os.utime(self.path, ns=(self.mtime_ns, self.mtime_ns))
+
+    def test_reloads_only_when_changed(self) -> None:
+        self.write('activities = ["a", { name = "b", weight = 2 }]')
+
+        self.assertTrue(self.playlist.refresh())
+        self.assertFalse(self.playlist.refresh())
+        self.assertEqual(self.playlist.activities, [Activity("a"), Activity("b", 2)])
+
+        self.write('activities = ["c"]')
+        self.assertTrue(self.playlist.refresh())
+        self.assertEqual(self.playlist.activities, [Activity("c")])
+
+    def test_invalid_file_keeps_the_previous_activities(self) -> None:
+        self.write('activities = ["a"]')
+        self.playlist.refresh()
+        self.write("activities = [")
+
+        with self.assertLogs("cogs.Presence.playlist", "ERROR"):
+            self.assertFalse(self.playlist.refresh())
+        self.assertEqual(self.playlist.activities, [Activity("a")])
+
+    def test_missing_file_keeps_the_previous_activities(self) -> None:
+        self.write('activities = ["a"]')
+        self.playlist.refresh()
+        self.path.unlink()
+
+        with self.assertLogs("cogs.Presence.playlist", "WARNING"):
+            self.assertFalse(self.playlist.refresh())
+        self.assertEqual(self.playlist.activities, [Activity("a")])
+
+        self.write('activities = ["b"]')
+        self.assertTrue(self.playlist.refresh())
+        self.assertEqual(self.playlist.activities, [Activity("b")])
+
+    def test_missing_file_on_the_first_load_raises(self) -> None:
+        with self.assertRaises(FileNotFoundError):
+            self.playlist.refresh()
+
+
+if __name__ == "__main__":
+    unittest.main()
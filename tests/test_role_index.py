@@ -0,0 +1,50 @@
+"""Tests of the index of the guild roles used by the checks."""
+
+import unittest
+from types import SimpleNamespace
+
+from cogs.utils.checks import RoleIndex
+
+
+def make_guild(*roles: tuple[int, str]) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=1, roles=[SimpleNamespace(id=id_, name=name) for id_, name in roles]
+    )
+
+
+class TestRoleIndex(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.index = RoleIndex()
+
+    def get(self, guild: SimpleNamespace, item: int | str) -> SimpleNamespace | None:
+        return self.index.get(guild, item)  # type: ignore[arg-type, return-value]
+
+    def test_roles_by_id_and_name(self) -> None:
+        guild = make_guild((10, "Moderator"), (11, "Member"), (12, "Member"))
+
+        self.assertEqual(self.get(guild, 11), guild.roles[1])
+        self.assertEqual(self.get(guild, "Member"), guild.roles[1])
+        self.assertIsNone(self.get(guild, "member"))
+        self.assertIsNone(self.get(guild, 13))
+
+    async def test_role_event_rebuilds_the_index(self) -> None:
+        guild = make_guild((10, "Moderator"))
+        self.get(guild, 10)
+        guild.roles.append(SimpleNamespace(id=11, name="Member", guild=guild))
+
+        await self.index.on_guild_role_create(guild.roles[-1])  # type: ignore[arg-type]
+
+        self.assertEqual(self.get(guild, "Member"), guild.roles[-1])
+
+    def test_new_session_rebuilds_the_index(self) -> None:
+        # a fresh IDENTIFY replaces the guild and its roles, without role events
+        old = make_guild((10, "Moderator"))
+        self.get(old, "Moderator")
+        new = make_guild((20, "Moderator"))
+
+        self.assertEqual(self.get(new, "Moderator"), new.roles[0])
+        self.assertIsNone(self.get(new, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()